@@ -0,0 +1,313 @@
+"""End-to-end benchmark of `Client` against a local `Server`.
+
+Runs entirely offline: both sides use `FakeKami` instead of the signing
+service. For each payload size, mode and concurrency level it reports
+throughput, p50/p99 latency, CPU time per request and bytes on the wire.
+
+Client and server share one process and event loop, so CPU time per request
+covers both sides. Bytes on the wire count request and response bodies as
+sent, after compression, excluding headers.
+
+Usage:
+    python -m benchmarks.bench_e2e
+    python -m benchmarks.bench_e2e --sizes small,large --concurrency 1,64 --output results.json
+    python -m benchmarks.bench_e2e --baseline results.json --tolerance 0.15
+
+With `--baseline`, exits with status 1 if any scenario's throughput drops or
+p99 latency rises by more than `--tolerance` compared to the baseline.
+"""
+
+import argparse
+import asyncio
+import random
+import socket
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Callable
+
+import aiohttp
+import orjson
+from loguru import logger
+from pydantic import BaseModel
+
+from messaging import Client, Server
+
+from .fake_kami import FakeKami
+
+
+class SmallSynapse(BaseModel):
+    blob: str = ""
+    values: list[float] = []
+
+
+class MediumSynapse(SmallSynapse):
+    pass
+
+
+class LargeSynapse(SmallSynapse):
+    pass
+
+
+# synapse, approximate serialized size in bytes
+PAYLOADS: dict[str, tuple[type[SmallSynapse], int]] = {
+    "small": (SmallSynapse, 1_000),
+    "medium": (MediumSynapse, 100_000),
+    "large": (LargeSynapse, 2_000_000),
+}
+MODES = ("send", "batch_send", "batch_send_grouped")
+
+
+def _make_payload(synapse: type[SmallSynapse], size: int, seed: int) -> SmallSynapse:
+    """Half random words (compressible), half random floats (less so)"""
+    rng = random.Random(seed)
+    words = ["validator", "miner", "synapse", "dojo", "task", "score", "hotkey"]
+    blob: list[str] = []
+    length = 0
+    while length < size // 2:
+        word = rng.choice(words)
+        blob.append(word)
+        length += len(word) + 1
+    # NOTE: each float is ~20 bytes once serialized
+    values = [rng.random() for _ in range(max(1, size // 40))]
+    return synapse(blob=" ".join(blob), values=values)
+
+
+async def _echo(request: Any, payload: SmallSynapse) -> SmallSynapse:
+    return payload
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wire_counter() -> tuple[aiohttp.TraceConfig, SimpleNamespace]:
+    counter = SimpleNamespace(sent=0, received=0)
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_chunk_sent(session: Any, ctx: Any, params: Any) -> None:
+        counter.sent += len(params.chunk)
+
+    async def on_chunk_received(session: Any, ctx: Any, params: Any) -> None:
+        counter.received += len(params.chunk)
+
+    trace_config.on_request_chunk_sent.append(on_chunk_sent)
+    trace_config.on_response_chunk_received.append(on_chunk_received)
+    return trace_config, counter
+
+
+def _percentile(latencies: list[float], pct: float) -> float:
+    ordered = sorted(latencies)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+async def _run_scenario(
+    client: Client,
+    url: str,
+    models: list[BaseModel],
+    mode: str,
+    concurrency: int,
+    requests: int,
+) -> tuple[list[float], int]:
+    """Returns per-request latencies in ms and the number of failed requests"""
+    latencies: list[float] = []
+    failures = 0
+
+    if mode == "send":
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _one(model: BaseModel) -> None:
+            nonlocal failures
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.send(url, model, enable_preflight=False)
+                latencies.append((time.perf_counter() - start) * 1000)
+                failures += bool(response.exception or response.error)
+
+        await asyncio.gather(*[_one(models[i % len(models)]) for i in range(requests)])
+        return latencies, failures
+
+    # NOTE: batch modes send rounds of `concurrency` requests, every request
+    # in a round is assigned the latency of the whole round
+    for offset in range(0, requests, concurrency):
+        round_size = min(concurrency, requests - offset)
+        start = time.perf_counter()
+        responses = await client.batch_send(
+            [url] * round_size,
+            [models[(offset + i) % len(models)] for i in range(round_size)],
+            group_by_host=mode == "batch_send_grouped",
+            enable_preflight=False,
+        )
+        elapsed = (time.perf_counter() - start) * 1000
+        latencies.extend([elapsed] * round_size)
+        failures += sum(bool(r.exception or r.error) for r in responses)
+    return latencies, failures
+
+
+async def run(args: argparse.Namespace) -> list[dict[str, Any]]:
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+
+    server_kami = FakeKami(verify_latency_ms=args.verify_latency_ms)
+    client_kami = FakeKami(sign_latency_ms=args.sign_latency_ms)
+
+    server = Server(kami=server_kami, log_level="ERROR")  # type: ignore[arg-type]
+    # NOTE: Server reconfigures logging, silence loguru again
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    for synapse, _ in PAYLOADS.values():
+        server.serve_synapse(synapse, _echo)
+
+    port = _free_port()
+    server_task = asyncio.create_task(server.initialise(port))
+    while not getattr(getattr(server, "server", None), "started", False):
+        await asyncio.sleep(0.05)
+
+    trace_config, wire = _wire_counter()
+    session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=256, limit_per_host=args.limit_per_host, enable_cleanup_closed=True
+        ),
+        trace_configs=[trace_config],
+    )
+    client = Client(hotkey="bench", session=session, kami=client_kami)  # type: ignore[arg-type]
+    url = f"http://127.0.0.1:{port}"
+
+    results: list[dict[str, Any]] = []
+    try:
+        for size_name in args.sizes:
+            synapse, size = PAYLOADS[size_name]
+            # NOTE: distinct payloads, identical ones compress unrealistically
+            # well when batched together
+            models = [
+                _make_payload(synapse, size, args.seed + i)
+                for i in range(args.pool_size)
+            ]
+            for mode in args.modes:
+                for concurrency in args.concurrency:
+                    requests = max(concurrency, args.requests)
+                    # warm up connections and caches
+                    await _run_scenario(
+                        client, url, models, mode, concurrency, concurrency
+                    )
+
+                    wire.sent = wire.received = 0
+                    cpu_start = time.process_time()
+                    wall_start = time.perf_counter()
+                    latencies, failures = await _run_scenario(
+                        client, url, models, mode, concurrency, requests
+                    )
+                    wall = time.perf_counter() - wall_start
+                    cpu = time.process_time() - cpu_start
+
+                    result = {
+                        "scenario": f"{size_name}/{mode}/c{concurrency}",
+                        "payload_bytes": len(models[0].model_dump_json()),
+                        "requests": requests,
+                        "failures": failures,
+                        "throughput_rps": requests / wall,
+                        "p50_ms": _percentile(latencies, 50),
+                        "p99_ms": _percentile(latencies, 99),
+                        "mean_ms": statistics.fmean(latencies),
+                        "cpu_ms_per_req": cpu * 1000 / requests,
+                        "wire_bytes_per_req": (wire.sent + wire.received) / requests,
+                    }
+                    results.append(result)
+                    _print_result(result)
+    finally:
+        await client.close()
+        server.server.should_exit = True
+        await server_task
+
+    return results
+
+
+def _print_result(result: dict[str, Any]) -> None:
+    print(
+        f"{result['scenario']:<32} "
+        f"{result['throughput_rps']:>9.1f} req/s  "
+        f"p50 {result['p50_ms']:>8.2f}ms  "
+        f"p99 {result['p99_ms']:>8.2f}ms  "
+        f"cpu {result['cpu_ms_per_req']:>7.3f}ms/req  "
+        f"wire {result['wire_bytes_per_req'] / 1024:>9.1f}KiB/req  "
+        f"failed {result['failures']}",
+        flush=True,
+    )
+
+
+def compare(
+    results: list[dict[str, Any]], baseline: list[dict[str, Any]], tolerance: float
+) -> list[str]:
+    """Returns a description of each scenario that regressed beyond tolerance"""
+    previous = {r["scenario"]: r for r in baseline}
+    regressions: list[str] = []
+    for result in results:
+        base = previous.get(result["scenario"])
+        if not base:
+            continue
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{result['scenario']}: throughput {base['throughput_rps']:.1f} -> {result['throughput_rps']:.1f} req/s"
+            )
+        if result["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{result['scenario']}: p99 {base['p99_ms']:.2f} -> {result['p99_ms']:.2f} ms"
+            )
+    return regressions
+
+
+def _csv(cast: Callable[[str], Any]) -> Callable[[str], list[Any]]:
+    return lambda value: [cast(v) for v in value.split(",") if v]
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=_csv(str), default=list(PAYLOADS))
+    parser.add_argument("--modes", type=_csv(str), default=list(MODES))
+    parser.add_argument("--concurrency", type=_csv(int), default=[1, 16, 64])
+    parser.add_argument(
+        "--requests", type=int, default=200, help="requests per scenario"
+    )
+    parser.add_argument("--limit-per-host", type=int, default=10)
+    parser.add_argument("--sign-latency-ms", type=float, default=1.0)
+    parser.add_argument("--verify-latency-ms", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--pool-size", type=int, default=16, help="distinct payloads per size"
+    )
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args(argv)
+    for size in args.sizes:
+        if size not in PAYLOADS:
+            parser.error(f"unknown size {size}, expected one of {list(PAYLOADS)}")
+    for mode in args.modes:
+        if mode not in MODES:
+            parser.error(f"unknown mode {mode}, expected one of {list(MODES)}")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+
+    if args.baseline:
+        with open(args.baseline, "rb") as f:
+            regressions = compare(results, orjson.loads(f.read()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Import-time benchmark for `import messaging; messaging.Client`.
+
+Each scenario runs in a fresh interpreter, repeated `--runs` times, and reports
+the median and minimum import time, the peak RSS of the interpreter and how
+many modules were loaded.
+
+Scenarios:
+    client: what a client-only process pays with lazy imports
+    eager:  the client plus the server stack, which is what
+            `import messaging` used to load eagerly
+
+Usage:
+    python -m benchmarks.bench_import --runs 20
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+import orjson
+
+SCENARIOS: dict[str, str] = {
+    "client": "import messaging; messaging.Client",
+    "eager": "import messaging; messaging.Client; import messaging.server, messaging.middleware",
+}
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+heavy = [m for m in ("fastapi", "starlette", "uvicorn", "httpx") if m in sys.modules]
+print(json.dumps({{"import_ms": elapsed * 1000, "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "modules": len(sys.modules), "heavy": heavy}}))
+"""
+
+
+def _probe(statement: str) -> dict[str, object]:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(statement=statement)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return orjson.loads(output)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    for name, statement in SCENARIOS.items():
+        # warm up the filesystem and bytecode caches
+        _probe(statement)
+        results = [_probe(statement) for _ in range(args.runs)]
+        import_ms = [float(r["import_ms"]) for r in results]  # type: ignore[arg-type]
+        max_rss = [int(r["max_rss_kib"]) for r in results]  # type: ignore[arg-type]
+        print(
+            f"{name:<8} "
+            f"median {statistics.median(import_ms):>8.1f}ms  "
+            f"min {min(import_ms):>8.1f}ms  "
+            f"rss {statistics.median(max_rss) / 1024:>7.1f}MiB  "
+            f"modules {results[-1]['modules']:>5}  "
+            f"server stack loaded: {results[-1]['heavy'] or 'none'}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""Scaling benchmark of `ShardedClient.batch_send` with the number of processes.
+
+Starts `--servers` local servers, each in its own process and with
+`FakeKami`, that answer every request with the same large response, so that
+the client side spends its time decompressing, parsing and validating.
+Each round sends `--round-size` requests spread across the servers. Plain
+`Client.batch_send` on one event loop is the baseline, then `ShardedClient`
+with each of `--processes`.
+
+Speedups depend on free cores: with fewer cores than servers plus client
+processes, the servers and the workers compete for CPU.
+
+Usage:
+    python -m benchmarks.bench_sharded
+    python -m benchmarks.bench_sharded --processes 1,2,4,8 --servers 4 --rounds 5
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from functools import partial
+from typing import Any, Callable
+
+from loguru import logger
+
+from messaging import Client, Server
+from messaging.sharding import ShardedClient
+
+from .bench_e2e import MediumSynapse, _csv, _free_port, _make_payload
+from .fake_kami import FakeKami
+
+
+class Answer(MediumSynapse):
+    """Sent empty, answered with a large payload"""
+
+
+def _serve(port: int, response_size: int) -> None:
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    server = Server(kami=FakeKami(), log_level="ERROR")  # type: ignore[arg-type]
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    answer = _make_payload(Answer, response_size, seed=0)
+
+    async def _answer(request: Any, payload: Answer) -> Answer:
+        return answer  # type: ignore[return-value]
+
+    server.serve_synapse(Answer, _answer)
+    asyncio.run(server.initialise(port))
+
+
+def _make_client(hotkey: str) -> Client:
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    return Client(hotkey=hotkey, kami=FakeKami())  # type: ignore[arg-type]
+
+
+async def _wait_for_servers(urls: list[str]) -> None:
+    client = _make_client("bench")
+    try:
+        for _ in range(100):
+            responses = await client.batch_send(
+                urls, [Answer() for _ in urls], enable_preflight=False, max_retries=1
+            )
+            if all(r.exception is None for r in responses):
+                return
+            await asyncio.sleep(0.1)
+        raise RuntimeError("servers did not start")
+    finally:
+        await client.close()
+
+
+async def _time_rounds(
+    send: Callable[[list[str], list[Answer]], Any],
+    urls: list[str],
+    rounds: int,
+) -> tuple[float, int]:
+    """Returns the requests per second and the number of failed requests"""
+    models = [Answer() for _ in urls]
+    # warm up connections, workers and caches
+    await send(urls, models)
+    failures = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        responses = await send(urls, models)
+        failures += sum(bool(r.exception or r.error) for r in responses)
+    return len(urls) * rounds / (time.perf_counter() - start), failures
+
+
+async def run(args: argparse.Namespace) -> list[dict[str, Any]]:
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+
+    context = multiprocessing.get_context("spawn")
+    ports = [_free_port() for _ in range(args.servers)]
+    servers = [
+        context.Process(target=_serve, args=(port, args.response_size), daemon=True)
+        for port in ports
+    ]
+    for process in servers:
+        process.start()
+
+    base_urls = [f"http://127.0.0.1:{port}" for port in ports]
+    urls = [base_urls[i % len(base_urls)] for i in range(args.round_size)]
+    kwargs = {"enable_preflight": False, "group_by_host": False}
+    results: list[dict[str, Any]] = []
+    try:
+        await _wait_for_servers(base_urls)
+
+        client = _make_client("bench")
+        try:
+            rps, failures = await _time_rounds(
+                partial(client.batch_send, **kwargs), urls, args.rounds
+            )
+        finally:
+            await client.close()
+        results.append(
+            {"scenario": "Client", "throughput_rps": rps, "failures": failures}
+        )
+        baseline = rps
+        _print_result(results[-1], baseline)
+
+        for processes in args.processes:
+            sharded = ShardedClient(
+                "bench",
+                processes=processes,
+                client_factory=partial(_make_client, "bench"),
+            )
+            try:
+                rps, failures = await _time_rounds(
+                    partial(sharded.batch_send, **kwargs), urls, args.rounds
+                )
+            finally:
+                sharded.close()
+            results.append(
+                {
+                    "scenario": f"ShardedClient/p{processes}",
+                    "throughput_rps": rps,
+                    "failures": failures,
+                }
+            )
+            _print_result(results[-1], baseline)
+    finally:
+        for process in servers:
+            process.terminate()
+            process.join()
+    return results
+
+
+def _print_result(result: dict[str, Any], baseline: float) -> None:
+    print(
+        f"{result['scenario']:<24} "
+        f"{result['throughput_rps']:>9.1f} req/s  "
+        f"speedup {result['throughput_rps'] / baseline:>5.2f}x  "
+        f"failed {result['failures']}",
+        flush=True,
+    )
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--processes",
+        type=_csv(int),
+        default=sorted({1, 2, max(1, cpus // 2)}),
+        help="worker process counts to benchmark",
+    )
+    parser.add_argument("--servers", type=int, default=max(1, cpus // 2))
+    parser.add_argument("--round-size", type=int, default=512)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument(
+        "--response-size", type=int, default=100_000, help="approximate bytes"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    print(f"{os.cpu_count()} CPUs, {args.servers} servers", flush=True)
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
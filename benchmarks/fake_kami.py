@@ -0,0 +1,41 @@
+import asyncio
+import hashlib
+
+
+class FakeKami:
+    """In-process stand-in for `kami.KamiClient`, so that `Client` and `Server`
+    can be benchmarked without the signing service.
+
+    Signatures are deterministic hashes of the message, and both signing and
+    verification sleep for a configurable latency to model the round-trip to
+    Kami.
+    """
+
+    def __init__(self, sign_latency_ms: float = 0.0, verify_latency_ms: float = 0.0):
+        self.sign_latency_ms = sign_latency_ms
+        self.verify_latency_ms = verify_latency_ms
+        self.sign_calls = 0
+        self.verify_calls = 0
+
+    @staticmethod
+    def _signature(message: str) -> str:
+        return "0x" + hashlib.sha256(message.encode()).hexdigest()
+
+    async def sign_message(self, message: str) -> str:
+        self.sign_calls += 1
+        if self.sign_latency_ms:
+            await asyncio.sleep(self.sign_latency_ms / 1000)
+        return self._signature(message)
+
+    async def verify(self, hotkey: str, message: str, signature: str) -> bool:
+        self.verify_calls += 1
+        if not signature.startswith("0x"):
+            raise ValueError(
+                f"Expected signature to be a hex string!, got: {signature=}"
+            )
+        if self.verify_latency_ms:
+            await asyncio.sleep(self.verify_latency_ms / 1000)
+        return signature == self._signature(message)
+
+    async def close(self) -> None:
+        pass
@@ -1,10 +1,86 @@
 # from .server import _register_route_handler as _register_route_handler
-from .client import Client, get_client
-from .exceptions import InvalidSignatureException
-from .middleware import SignatureMiddleware, ZstdMiddleware
-from .server import Request, Server
-from .types import HOTKEY_HEADER, PydanticModel, ServerHandlerFunc, StdResponse
-from .utils import extract_headers
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+# NOTE: attributes are imported lazily on first access, so that client-only
+# processes (e.g. validators that only use `Client`) don't load FastAPI,
+# Starlette and uvicorn
+_LAZY_ATTRS: dict[str, str] = {
+    "Server": ".server",
+    "Request": ".server",
+    "Client": ".client",
+    "get_client": ".client",
+    "extract_headers": ".utils",
+    "StdResponse": ".types",
+    "PydanticModel": ".types",
+    "HOTKEY_HEADER": ".types",
+    "ServerHandlerFunc": ".types",
+    "ServerStreamHandlerFunc": ".types",
+    "BatchHandlerFunc": ".types",
+    "BatchMetrics": ".batching",
+    "ZstdMiddleware": ".middleware",
+    "SignatureMiddleware": ".middleware",
+    "InvalidSignatureException": ".exceptions",
+    "SynapseStatusError": ".exceptions",
+    "SynapseCodec": ".registry",
+    "get_codec": ".registry",
+    "register_synapse": ".registry",
+    "VerificationDispatcher": ".verification",
+    "BackgroundSink": ".log",
+    "AccessLogSampler": ".log",
+    "RetryBudget": ".retry",
+    "RetryBudgetMetrics": ".retry",
+    "AdaptiveLimiter": ".concurrency",
+    "LimiterMetrics": ".concurrency",
+    "CapturedRequest": ".capture",
+    "read_capture": ".capture",
+    "ShardedClient": ".sharding",
+    "WorkerRequestError": ".exceptions",
+    "PayloadTooLargeError": ".exceptions",
+}
+
+if TYPE_CHECKING:
+    from .batching import BatchMetrics
+    from .capture import CapturedRequest, read_capture
+    from .client import Client, get_client
+    from .concurrency import AdaptiveLimiter, LimiterMetrics
+    from .exceptions import (
+        InvalidSignatureException,
+        PayloadTooLargeError,
+        SynapseStatusError,
+        WorkerRequestError,
+    )
+    from .log import AccessLogSampler, BackgroundSink
+    from .middleware import SignatureMiddleware, ZstdMiddleware
+    from .registry import SynapseCodec, get_codec, register_synapse
+    from .retry import RetryBudget, RetryBudgetMetrics
+    from .server import Request, Server
+    from .sharding import ShardedClient
+    from .verification import VerificationDispatcher
+    from .types import (
+        HOTKEY_HEADER,
+        BatchHandlerFunc,
+        PydanticModel,
+        ServerHandlerFunc,
+        ServerStreamHandlerFunc,
+        StdResponse,
+    )
+    from .utils import extract_headers
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name, __name__), name)
+    # cache so that __getattr__ is only called once per attribute
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + list(_LAZY_ATTRS))
+
 
 __all__ = [
     "Server",
@@ -16,7 +92,26 @@ __all__ = [
     "PydanticModel",
     "HOTKEY_HEADER",
     "ServerHandlerFunc",
+    "ServerStreamHandlerFunc",
+    "BatchHandlerFunc",
+    "BatchMetrics",
     "ZstdMiddleware",
     "SignatureMiddleware",
     "InvalidSignatureException",
+    "SynapseStatusError",
+    "SynapseCodec",
+    "get_codec",
+    "register_synapse",
+    "VerificationDispatcher",
+    "BackgroundSink",
+    "AccessLogSampler",
+    "RetryBudget",
+    "RetryBudgetMetrics",
+    "AdaptiveLimiter",
+    "LimiterMetrics",
+    "CapturedRequest",
+    "read_capture",
+    "ShardedClient",
+    "WorkerRequestError",
+    "PayloadTooLargeError",
 ]
@@ -0,0 +1,180 @@
+import asyncio
+import time
+from http import HTTPStatus
+from typing import Any, Generic
+
+from fastapi import HTTPException
+from loguru import logger
+from pydantic import BaseModel
+from starlette.requests import HTTPConnection
+
+from .types import BatchHandlerFunc, PydanticModel
+
+
+class BatchMetrics(BaseModel):
+    """Counters for a micro-batched synapse"""
+
+    batches: int = 0
+    items: int = 0
+    failed_batches: int = 0
+    rejected: int = 0
+    last_batch_size: int = 0
+    max_batch_size: int = 0
+    last_batch_latency_ms: float = 0.0
+    max_batch_latency_ms: float = 0.0
+    total_batch_latency_ms: float = 0.0
+
+    @property
+    def avg_batch_size(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+    @property
+    def avg_batch_latency_ms(self) -> float:
+        return self.total_batch_latency_ms / self.batches if self.batches else 0.0
+
+
+class MicroBatcher(Generic[PydanticModel]):
+    """Collects validated payloads for up to `max_batch_size` items or
+    `max_wait_ms` milliseconds, whichever comes first, then calls the batch
+    handler once and hands each caller its own result.
+
+    Backpressure: at most `max_pending` payloads may wait to be batched, further
+    requests are rejected with 503, and at most `max_concurrent_batches`
+    batches run at the same time.
+    """
+
+    def __init__(
+        self,
+        handler: BatchHandlerFunc[PydanticModel],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+        max_pending: int = 1024,
+        max_concurrent_batches: int = 1,
+    ) -> None:
+        assert max_batch_size > 0, "max_batch_size must be positive"
+        # NOTE: a queue with maxsize <= 0 is unbounded
+        assert max_pending > 0, "max_pending must be positive"
+        assert max_concurrent_batches > 0, "max_concurrent_batches must be positive"
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait_sec = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.metrics = BatchMetrics()
+        self._queue: asyncio.Queue[
+            tuple[HTTPConnection, PydanticModel, asyncio.Future[Any]]
+        ] = asyncio.Queue(maxsize=max_pending)
+        self._max_concurrent_batches = max_concurrent_batches
+        self._slots: asyncio.Semaphore | None = None
+        self._worker: asyncio.Task[None] | None = None
+        self._batches: set[asyncio.Task[None]] = set()
+        # futures of queued and in-progress payloads, failed on `close`
+        self._futures: set[asyncio.Future[Any]] = set()
+        self._closed = False
+
+    async def submit(self, request: HTTPConnection, payload: PydanticModel) -> Any:
+        """Queue a payload for the next batch and wait for its result"""
+        if self._closed:
+            raise HTTPException(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                detail=f"Batch handler {self.handler.__name__} is shutting down",
+            )
+        if self._worker is None or self._worker.done():
+            self._slots = asyncio.Semaphore(self._max_concurrent_batches)
+            self._worker = asyncio.create_task(self._run())
+
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((request, payload, future))
+        except asyncio.QueueFull:
+            self.metrics.rejected += 1
+            raise HTTPException(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                detail=f"Too many pending requests for {self.handler.__name__}, max_pending={self.max_pending}",
+            )
+        self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        assert self._slots is not None
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_sec
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._slots.acquire()
+            task = asyncio.create_task(self._process(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _process(
+        self, batch: list[tuple[HTTPConnection, PydanticModel, asyncio.Future[Any]]]
+    ) -> None:
+        assert self._slots is not None
+        requests = [request for request, _, _ in batch]
+        payloads = [payload for _, payload, _ in batch]
+        futures = [future for _, _, future in batch]
+        start = time.perf_counter()
+        try:
+            results = await self.handler(requests, payloads)  # type: ignore[arg-type]
+            if len(results) != len(batch):
+                raise ValueError(
+                    f"Batch handler {self.handler.__name__} returned {len(results)} results for {len(batch)} payloads"
+                )
+            for future, result in zip(futures, results):
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        except Exception as e:
+            self.metrics.failed_batches += 1
+            logger.error(f"Batch handler {self.handler.__name__} failed: {e}")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+            self._record(len(batch), (time.perf_counter() - start) * 1000)
+
+    def _record(self, batch_size: int, latency_ms: float) -> None:
+        metrics = self.metrics
+        metrics.batches += 1
+        metrics.items += batch_size
+        metrics.last_batch_size = batch_size
+        metrics.max_batch_size = max(metrics.max_batch_size, batch_size)
+        metrics.last_batch_latency_ms = latency_ms
+        metrics.max_batch_latency_ms = max(metrics.max_batch_latency_ms, latency_ms)
+        metrics.total_batch_latency_ms += latency_ms
+        logger.debug(
+            f"Batch handler {self.handler.__name__} processed {batch_size=} in {latency_ms:.2f}ms, pending={self._queue.qsize()}"
+        )
+
+    async def close(self) -> None:
+        """Stop batching, callers still waiting for a result are answered with
+        503 instead of hanging"""
+        self._closed = True
+        for future in list(self._futures):
+            if not future.done():
+                future.set_exception(
+                    HTTPException(
+                        status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                        detail=f"Batch handler {self.handler.__name__} is shutting down",
+                    )
+                )
+        if self._worker is not None:
+            self._worker.cancel()
+        for task in list(self._batches):
+            task.cancel()
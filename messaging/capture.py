@@ -0,0 +1,144 @@
+import mmap
+import queue
+import struct
+import threading
+from typing import Any, Iterator, Mapping
+
+import orjson
+from loguru import logger
+from pydantic import BaseModel
+
+from .types import SIGNATURE_HEADER
+
+# NOTE: the body is stored decoded, so headers describing its encoding on the
+# wire no longer apply
+_DROPPED_HEADERS = frozenset(
+    {SIGNATURE_HEADER, "content-encoding", "content-length", "transfer-encoding"}
+)
+
+# (length of the JSON metadata, length of the body)
+RECORD_PREFIX = struct.Struct(">II")
+CAPTURE_MAGIC = b"SYNCAP1\n"
+
+
+class CapturedRequest(BaseModel):
+    """A synapse request as recorded by `CaptureWriter`"""
+
+    timestamp: float
+    synapse: str
+    headers: dict[str, str]
+    size: int
+    handler_ms: float | None = None
+    status_code: int = 200
+    # decoded JSON body
+    body: bytes = b""
+
+
+class CaptureWriter:
+    """Appends captured synapse requests to a file from a background thread,
+    so that capturing never blocks the event loop on disk I/O.
+
+    Each record is a `RECORD_PREFIX` followed by JSON metadata and the raw
+    decoded body, so that `read_capture` can memory map the file and only
+    parse the small metadata of each record. Records are dropped, and counted in
+    `dropped`, once `max_queue_size` records are waiting to be written.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path: str, max_queue_size: int = 10_000) -> None:
+        self.path = path
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(CAPTURE_MAGIC)
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max_queue_size)
+        self.recorded = 0
+        self.dropped = 0
+        self._thread = threading.Thread(
+            target=self._run, name="synapse-capture", daemon=True
+        )
+        self._thread.start()
+
+    def record(
+        self,
+        timestamp: float,
+        synapse: str,
+        headers: Mapping[str, str],
+        body: bytes,
+        handler_ms: float | None,
+        status_code: int,
+    ) -> None:
+        metadata = orjson.dumps(
+            {
+                "timestamp": timestamp,
+                "synapse": synapse,
+                "headers": {
+                    k: v
+                    for k, v in headers.items()
+                    if k.lower() not in _DROPPED_HEADERS
+                },
+                "size": len(body),
+                "handler_ms": handler_ms,
+                "status_code": status_code,
+            }
+        )
+        try:
+            self._queue.put_nowait(
+                (RECORD_PREFIX.pack(len(metadata), len(body)) + metadata, body)
+            )
+            self.recorded += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            record = self._queue.get()
+            if record is self._STOP:
+                break
+            try:
+                header, body = record
+                self._file.write(header)
+                self._file.write(body)
+                # NOTE: only flush once the backlog is drained
+                if self._queue.empty():
+                    self._file.flush()
+            except Exception as e:
+                logger.error(f"Failed to write captured request to {self.path}: {e}")
+        self._file.close()
+
+    def close(self) -> None:
+        """Write out the backlog and close the file"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(self._STOP)
+        self._thread.join(timeout=10)
+        if self.dropped:
+            logger.warning(
+                f"Dropped {self.dropped} captured requests, the capture file couldn't keep up"
+            )
+
+
+def read_capture(path: str) -> Iterator[CapturedRequest]:
+    """Iterate over the requests recorded in a capture file, memory mapping it
+    so that large captures are paged in lazily. A record truncated by a crash
+    while writing ends the iteration."""
+    with open(path, "rb") as f:
+        if not f.read(len(CAPTURE_MAGIC)):
+            return
+        f.seek(0)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped[: len(CAPTURE_MAGIC)] != CAPTURE_MAGIC:
+                raise ValueError(f"{path} is not a synapse capture file")
+            offset = len(CAPTURE_MAGIC)
+            while offset + RECORD_PREFIX.size <= len(mapped):
+                metadata_len, body_len = RECORD_PREFIX.unpack_from(mapped, offset)
+                offset += RECORD_PREFIX.size
+                end = offset + metadata_len + body_len
+                if end > len(mapped):
+                    logger.warning(f"Truncated record at the end of {path}")
+                    return
+                metadata = orjson.loads(mapped[offset : offset + metadata_len])
+                yield CapturedRequest(
+                    **metadata, body=mapped[offset + metadata_len : end]
+                )
+                offset = end
@@ -0,0 +1,141 @@
+import asyncio
+import itertools
+from typing import Any
+
+import aiohttp
+import orjson
+from aiohttp import WebSocketError, WSCloseCode
+from loguru import logger
+from pydantic import BaseModel
+
+from .client_utils import MESSAGE_ID, check_size, compress_json, decompress_json
+from .exceptions import PayloadTooLargeError
+
+# (response future, max compressed size, max decompressed size)
+PendingRequest = tuple[asyncio.Future[dict[str, Any]], int | None, int | None]
+
+
+class MultiplexChannel:
+    """A single websocket connection to a `Server`, shared by many concurrent
+    requests. Responses are matched to their requests by ID, so requests do not
+    queue behind each other the way they do over HTTP/1.1 connections.
+
+    Each request tells the server the size limits of its response, the server
+    answers with a 413 in place of a larger response, which fails the request
+    with `PayloadTooLargeError`. The limits are also enforced on arrival.
+    """
+
+    def __init__(
+        self,
+        ws: aiohttp.ClientWebSocketResponse,
+        max_message_size: int | None = None,
+    ) -> None:
+        """
+        Args:
+            ws (aiohttp.ClientWebSocketResponse): connection to the server
+            max_message_size (int | None): `max_msg_size` of the connection,
+                larger messages close the connection
+        """
+        self._ws = ws
+        self._max_message_size = max_message_size
+        self._ids = itertools.count()
+        self._pending: dict[int, PendingRequest] = {}
+        self._reader = asyncio.create_task(self._read_loop())
+
+    @property
+    def closed(self) -> bool:
+        return self._ws.closed or self._reader.done()
+
+    async def request(
+        self,
+        model: BaseModel,
+        timeout_sec: float,
+        max_compressed_size: int | None = None,
+        max_decompressed_size: int | None = None,
+    ) -> dict[str, Any]:
+        """Send the model to the synapse of the same name, and wait for its
+        {body, error, metadata, status} envelope. Raises `PayloadTooLargeError`
+        if the response exceeds either limit."""
+        # NOTE: larger messages would close the whole connection
+        if self._max_message_size is not None:
+            max_compressed_size = min(
+                max_compressed_size or self._max_message_size, self._max_message_size
+            )
+        request_id = next(self._ids)
+        future: asyncio.Future[dict[str, Any]] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._pending[request_id] = (future, max_compressed_size, max_decompressed_size)
+        try:
+            await self._ws.send_bytes(
+                MESSAGE_ID.pack(request_id)
+                + compress_json(
+                    {
+                        "synapse": model.__class__.__name__,
+                        # NOTE: avoid a round trip through python objects
+                        "body": orjson.Fragment(model.model_dump_json()),
+                        "max_size": [max_compressed_size, max_decompressed_size],
+                    }
+                )
+            )
+            return await asyncio.wait_for(future, timeout=timeout_sec)
+        finally:
+            self._pending.pop(request_id, None)
+
+    def _resolve(self, data: bytes) -> None:
+        if len(data) < MESSAGE_ID.size:
+            logger.error("Received multiplexed response without a request ID")
+            return
+        (request_id,) = MESSAGE_ID.unpack_from(data)
+        pending = self._pending.get(request_id)
+        if pending is None or pending[0].done():
+            # NOTE: the request already timed out
+            return
+        future, max_compressed_size, max_decompressed_size = pending
+        try:
+            check_size(len(data) - MESSAGE_ID.size, max_compressed_size, "compressed")
+            envelope: dict[str, Any] = decompress_json(
+                memoryview(data)[MESSAGE_ID.size :], max_decompressed_size
+            )
+        except Exception as e:
+            logger.error(f"Failed to decode multiplexed response: {e}")
+            future.set_exception(e)
+            return
+        too_large = envelope.get("too_large")
+        if too_large:
+            future.set_exception(PayloadTooLargeError(**too_large))
+        else:
+            future.set_result(envelope)
+
+    async def _read_loop(self) -> None:
+        closed_with: Exception = ConnectionError("Multiplexed channel was closed")
+        try:
+            async for msg in self._ws:
+                if (
+                    msg.type == aiohttp.WSMsgType.ERROR
+                    and isinstance(msg.data, WebSocketError)
+                    and msg.data.code == WSCloseCode.MESSAGE_TOO_BIG
+                    and self._max_message_size is not None
+                ):
+                    # NOTE: the server ignored the limits of the requests, a
+                    # retry would fail the same way
+                    closed_with = PayloadTooLargeError(
+                        self._max_message_size + 1, self._max_message_size, "compressed"
+                    )
+                    logger.warning(f"Multiplexed channel was closed: {closed_with}")
+                    break
+                if msg.type == aiohttp.WSMsgType.BINARY:
+                    self._resolve(msg.data)
+        except Exception as e:
+            logger.warning(f"Multiplexed channel read loop failed: {e}")
+        finally:
+            for future, _, _ in self._pending.values():
+                if not future.done():
+                    future.set_exception(closed_with)
+
+    async def close(self) -> None:
+        try:
+            await self._ws.close()
+        except Exception:
+            pass
+        self._reader.cancel()
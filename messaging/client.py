@@ -1,32 +1,59 @@
 import asyncio
 import http
-from typing import Any, Sequence
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Sequence,
+    TypeVar,
+)
 
 import aiohttp
 import orjson
-import zstandard as zstd
 from aiohttp.client import ClientSession
 from kami import KamiClient
 from loguru import logger
 from orjson import JSONDecodeError
-from pydantic import BaseModel
-from tenacity import (
-    AsyncRetrying,
-    RetryError,
-    stop_after_attempt,
-    wait_exponential,
+from pydantic import ValidationError
+from tenacity import RetryError
+
+from .channel import MultiplexChannel
+from .concurrency import AdaptiveLimiter, LimiterMetrics
+from .exceptions import PayloadTooLargeError, SynapseStatusError
+from .registry import SynapseCodec, get_codec
+from .retry import (
+    RetryBudget,
+    RetryBudgetMetrics,
+    backoff_delays,
+    is_retryable,
+    retry_error,
 )
-
-from .utils import retry_log
-
 from .types import (
+    BATCH_ROUTE,
+    FRAMED_STREAM_MEDIA_TYPE,
     HOTKEY_HEADER,
     MESSAGE_HEADER,
+    MULTIPLEX_ROUTE,
     SIGNATURE_HEADER,
+    STREAM_HEADER,
     PydanticModel,
     StdResponse,
 )
-from .utils import encode_body
+from .client_utils import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_MAX_COMPRESSED_SIZE,
+    DEFAULT_MAX_DECOMPRESSED_SIZE,
+    compress_json,
+    iter_encoded_body,
+    iter_frames,
+    read_decoded_response,
+    read_response,
+)
+
+
+T = TypeVar("T")
 
 
 def get_client(conn_limit: int = None, limit_per_host: int = None) -> ClientSession:  # type: ignore[assignment]
@@ -45,11 +72,115 @@ def get_client(conn_limit: int = None, limit_per_host: int = None) -> ClientSess
     )
 
 
-def _build_url(url: str, model: BaseModel, protocol: str = "http") -> str:
+def _base_url(url: str, protocol: str = "http") -> str:
     if not url.startswith("http") and not url.startswith("https"):
         url = f"{protocol}://{url}"
 
-    return f"{url}/{model.__class__.__name__}"
+    return url.rstrip("/")
+
+
+def _parse_response(
+    model: PydanticModel,
+    response_json: dict[str, Any],
+    client_resp: aiohttp.ClientResponse | None,
+    context_msg: str,
+) -> StdResponse[PydanticModel]:
+    """Parse a {body, error, metadata} envelope into a typed `StdResponse`"""
+    model_name = model.__class__.__name__
+    if not response_json:
+        logger.warning("Empty response JSON received")
+        return StdResponse(
+            # NOTE: here we're creating an empty instance
+            body=model.model_construct(),
+            exception=ValueError(f"Empty response JSON received for {model_name}"),
+            client_response=client_resp,
+        )
+
+    error: str | None = response_json.get("error", None)
+    metadata: dict[str, Any] = response_json.get("metadata", {})
+    body: dict[str, Any] = response_json.get("body", {})
+
+    if not body:
+        logger.warning("Response body is empty, skipped parsing.")
+        return StdResponse(
+            body=model.model_construct(),
+            error=error,
+            metadata=metadata,
+            client_response=client_resp,
+        )
+
+    try:
+        # parse object to the specific model
+        pydantic_model = model.model_validate(body)
+        logger.success(f"Successfully received response, {context_msg}")
+        return StdResponse(
+            body=pydantic_model,
+            error=error,
+            metadata=metadata,
+            client_response=client_resp,
+        )
+    except Exception as e:
+        logger.error(f"Failed to validate model with body: {e}, returning the raw body")
+        # Return the raw body if validation fails
+        return StdResponse(
+            body=model.model_construct(**body),
+            error=error,
+            metadata=metadata,
+            client_response=client_resp,
+        )
+
+
+def _decode_response(
+    codec: SynapseCodec[PydanticModel],
+    model: PydanticModel,
+    response_bytes: bytes | bytearray,
+    client_resp: aiohttp.ClientResponse | None,
+    context_msg: str,
+) -> StdResponse[PydanticModel]:
+    """Parse and validate the response envelope in a single pass with the
+    synapse's codec, falling back to `_parse_response` if it doesn't validate
+    so that the raw body is still returned"""
+    try:
+        envelope = codec.decode_envelope(response_bytes)
+    except ValidationError:
+        try:
+            response_json = orjson.loads(response_bytes)
+        except JSONDecodeError as e:
+            logger.error(
+                f"Failed to decode response: {response_bytes[:1024]!r}, {context_msg}, exception: {e}"
+            )
+            raise
+        return _parse_response(model, response_json, client_resp, context_msg)
+
+    if not envelope or "body" not in envelope:
+        return _parse_response(model, envelope, client_resp, context_msg)
+
+    logger.success(f"Successfully received response, {context_msg}")
+    return StdResponse(
+        body=envelope["body"],
+        error=envelope.get("error"),
+        metadata=envelope.get("metadata") or {},
+        client_response=client_resp,
+    )
+
+
+def _is_overloaded(response: StdResponse[Any]) -> bool:
+    """Whether the request failed in a way that hints at overload, i.e. a
+    connection error, timeout or 5xx response"""
+    exception = response.exception
+    if isinstance(exception, RetryError):
+        exception = exception.last_attempt.exception()
+    return exception is not None and is_retryable(exception)
+
+
+def _total_limit(limits: Iterable[int | None]) -> int | None:
+    """Sum of several size limits, None if any of them is unlimited"""
+    total = 0
+    for limit in limits:
+        if limit is None:
+            return None
+        total += limit
+    return total
 
 
 async def _log_context(response: StdResponse[PydanticModel]) -> None:
@@ -73,14 +204,102 @@ class Client:
         self,
         hotkey: str,
         session: ClientSession | None = None,
+        multiplex: bool = False,
+        kami: KamiClient | None = None,
+        retry_budget: RetryBudget | None = None,
+        limiter: AdaptiveLimiter | None = None,
+        host_limiter: Callable[[], AdaptiveLimiter] | None = None,
+        max_compressed_size: int | None = DEFAULT_MAX_COMPRESSED_SIZE,
+        max_decompressed_size: int | None = DEFAULT_MAX_DECOMPRESSED_SIZE,
     ) -> None:
-        self._kami = KamiClient()
+        """
+        Args:
+            hotkey (str): hotkey used for signing requests
+            session (ClientSession | None): optional aiohttp session
+            multiplex (bool): share a single websocket connection per host for
+                all requests, matching responses by request ID. Hosts that do
+                not support it fall back to regular HTTP requests. Handlers of
+                multiplexed requests receive the server's `WebSocket` instead
+                of a `Request`, see `Server.serve_synapse`.
+            kami (KamiClient | None): optional client used for signing, defaults
+                to a new KamiClient
+            retry_budget (RetryBudget | None): budget shared by all requests of
+                this client, bounding retries to a fraction of first attempts,
+                defaults to `RetryBudget()`. Pass the same instance to several
+                clients to share it between them.
+            limiter (AdaptiveLimiter | None): adaptive limit on the requests
+                `batch_send` keeps in flight across all hosts
+            host_limiter (Callable[[], AdaptiveLimiter] | None): factory for an
+                adaptive limit on the requests `batch_send` keeps in flight to
+                each host, e.g. `lambda: AdaptiveLimiter(initial_limit=4)`
+            max_compressed_size (int | None): max size of a response body as
+                received, None, the default, disables the limit
+            max_decompressed_size (int | None): max size of a response body
+                once decompressed. Both are enforced while reading, larger
+                responses are aborted with `PayloadTooLargeError`. Limits passed
+                to `register_synapse` take precedence for that synapse.
+        """
+        self._kami = kami or KamiClient()
         self._hotkey = hotkey
         self._session: ClientSession = session or get_client()
         self._compression_headers = {
             "content-encoding": "zstd",
             "accept-encoding": "zstd",
         }
+        self._multiplex = multiplex
+        self._channels: dict[str, MultiplexChannel] = {}
+        self._channel_locks: dict[str, asyncio.Lock] = {}
+        self._multiplex_unsupported: set[str] = set()
+        self._batch_unsupported: set[str] = set()
+        self._retry_budget = retry_budget or RetryBudget()
+        self._limiter = limiter
+        self._host_limiter_factory = host_limiter
+        self._host_limiters: dict[str, AdaptiveLimiter] = {}
+        self._max_compressed_size = max_compressed_size
+        self._max_decompressed_size = max_decompressed_size
+
+    @property
+    def retry_metrics(self) -> RetryBudgetMetrics:
+        """How much of the retry budget has been used"""
+        return self._retry_budget.metrics
+
+    @property
+    def limiter_metrics(self) -> dict[str, LimiterMetrics]:
+        """Metrics of the global limiter, under "*", and of each host limiter"""
+        metrics = {
+            host: limiter.metrics for host, limiter in self._host_limiters.items()
+        }
+        if self._limiter is not None:
+            metrics["*"] = self._limiter.metrics
+        return metrics
+
+    def _size_limits(
+        self, codec: SynapseCodec[Any] | None = None
+    ) -> tuple[int | None, int | None]:
+        """(max compressed size, max decompressed size) of responses"""
+        if codec is None:
+            return self._max_compressed_size, self._max_decompressed_size
+        return (
+            codec.max_compressed_size
+            if codec.max_compressed_size is not None
+            else self._max_compressed_size,
+            codec.max_decompressed_size
+            if codec.max_decompressed_size is not None
+            else self._max_decompressed_size,
+        )
+
+    def _limiters_for(self, base_url: str) -> list[AdaptiveLimiter]:
+        """Limiters a request to `base_url` must pass, the host's first so that
+        requests waiting on a busy host don't hold global slots"""
+        limiters: list[AdaptiveLimiter] = []
+        if self._host_limiter_factory is not None:
+            limiter = self._host_limiters.get(base_url)
+            if limiter is None:
+                limiter = self._host_limiters[base_url] = self._host_limiter_factory()
+            limiters.append(limiter)
+        if self._limiter is not None:
+            limiters.append(self._limiter)
+        return limiters
 
     async def _build_headers(
         self,
@@ -109,11 +328,54 @@ class Client:
         if not self._session or self._session.closed:
             self._session = get_client()
 
+    async def _get_channel(
+        self, url: str, timeout_sec: float
+    ) -> MultiplexChannel | None:
+        """Get or open the multiplexed channel to a host, returns None if the
+        host does not support it"""
+        base_url = _base_url(url)
+        if base_url in self._multiplex_unsupported:
+            return None
+
+        channel = self._channels.get(base_url)
+        if channel and not channel.closed:
+            return channel
+
+        lock = self._channel_locks.setdefault(base_url, asyncio.Lock())
+        async with lock:
+            channel = self._channels.get(base_url)
+            if channel and not channel.closed:
+                return channel
+
+            try:
+                # NOTE: `timeout` of `ws_connect` only bounds closing the
+                # connection, so bound the handshake here, as it holds the lock
+                ws = await asyncio.wait_for(
+                    self._session.ws_connect(
+                        f"{base_url}{MULTIPLEX_ROUTE}",
+                        headers=await self._build_headers(include_compression=False),
+                        # NOTE: 0 disables aiohttp's limit
+                        max_msg_size=self._max_compressed_size or 0,
+                    ),
+                    timeout=timeout_sec,
+                )
+            except aiohttp.WSServerHandshakeError as e:
+                logger.warning(
+                    f"Host {base_url} does not support multiplexing, falling back to HTTP: {e}"
+                )
+                self._multiplex_unsupported.add(base_url)
+                return None
+
+            channel = MultiplexChannel(ws, self._max_compressed_size)
+            self._channels[base_url] = channel
+            return channel
+
     async def batch_send(
         self,
         urls: list[str],
         models: list[PydanticModel],
         semaphore: asyncio.BoundedSemaphore | None = None,
+        group_by_host: bool = True,
         **kwargs: Any,
     ) -> Sequence[StdResponse[PydanticModel]]:
         """Sends the following payloads to the given URLs concurrently.
@@ -124,6 +386,17 @@ class Client:
             urls (list[str]): urls
             models (list[PydanticModel]): models
             keypair (substrateinterface.Keypair): keypair
+            group_by_host (bool): when several models target the same host, send
+                them together in one request to the server's batch route. Hosts
+                that don't support it fall back to one request per model.
+                Batches skip the HEAD preflight, unserved synapses are reported
+                per model with 404, and models failing with a 5xx are re-sent
+                on their own with `send`, counting the batch as their first of
+                `max_retries` attempts. Handlers of batched models receive the
+                batch's `Request`, see `Server.serve_synapse`.
+
+        Concurrency is bounded by `semaphore` if given, and by the client's
+        adaptive limiters if configured.
 
         Returns:
             list[Response]: Returns both the aiohttp Response, and the model that
@@ -131,26 +404,209 @@ class Client:
         """
         if semaphore is None:
             logger.info("Attempting to batch sending requests without semaphore")
-            responses = await asyncio.gather(
-                *[self.send(url, model, **kwargs) for url, model in zip(urls, models)],
-            )
-            for r in responses:
-                await _log_context(r)
 
-            return responses
-
-        async def _send_with_semaphore(
-            url: str, model: PydanticModel
-        ) -> StdResponse[PydanticModel]:
+        async def _adaptive(
+            base_url: str,
+            coro: Awaitable[T],
+            is_overloaded: Callable[[T], bool | None],
+        ) -> T:
+            limiters = self._limiters_for(base_url)
+            if not limiters:
+                return await coro
+            starts: list[float] = []
+            overloaded: bool | None = None
+            try:
+                for limiter in limiters:
+                    starts.append(await limiter.acquire())
+                result = await coro
+                overloaded = is_overloaded(result)
+                return result
+            finally:
+                for limiter, start in zip(limiters, starts):
+                    limiter.release(start, overloaded)
+
+        async def _limited(
+            base_url: str,
+            coro: Awaitable[T],
+            is_overloaded: Callable[[T], bool | None],
+        ) -> T:
+            if semaphore is None:
+                return await _adaptive(base_url, coro, is_overloaded)
             async with semaphore:
-                return await self.send(url, model, **kwargs)
+                return await _adaptive(base_url, coro, is_overloaded)
+
+        def _is_batch_overloaded(
+            results: list[StdResponse[PydanticModel]] | None,
+        ) -> bool | None:
+            # NOTE: the batch route being unsupported says nothing about load,
+            # the fallback requests will be measured instead
+            if results is None:
+                return None
+            return any(_is_overloaded(r) for r in results)
+
+        responses: list[StdResponse[PydanticModel] | None] = [None] * len(urls)
+
+        async def _send_one(idx: int, **overrides: Any) -> None:
+            responses[idx] = await _limited(
+                _base_url(urls[idx]),
+                self.send(urls[idx], models[idx], **{**kwargs, **overrides}),
+                _is_overloaded,
+            )
 
-        responses = await asyncio.gather(
-            *[_send_with_semaphore(url, model) for url, model in zip(urls, models)],
+        async def _send_group(base_url: str, indices: list[int]) -> None:
+            results = await _limited(
+                base_url,
+                self._send_batch(base_url, [models[i] for i in indices], **kwargs),
+                _is_batch_overloaded,
+            )
+            if results is None:
+                await asyncio.gather(*[_send_one(i) for i in indices])
+                return
+            for idx, result in zip(indices, results):
+                responses[idx] = result
+            # NOTE: the batch was the first attempt of each model, those that
+            # failed in a retryable way are re-sent on their own like `send`
+            # would retry them, under the retry budget
+            max_retries = kwargs.get("max_retries", 2)
+            retries = [
+                idx
+                for idx, result in zip(indices, results)
+                if isinstance(result.exception, SynapseStatusError)
+                and is_retryable(result.exception)
+                and max_retries > 1
+                and self._retry_budget.try_retry()
+            ]
+            await asyncio.gather(
+                *[_send_one(idx, max_retries=max_retries - 1) for idx in retries]
+            )
+
+        # NOTE: multiplexed channels already share a connection per host, and
+        # streamed bodies are meant to be sent on their own
+        groups: dict[str, list[int]] = {}
+        if group_by_host and not self._multiplex and not kwargs.get("stream"):
+            for idx, url in enumerate(urls):
+                groups.setdefault(_base_url(url), []).append(idx)
+        else:
+            groups = {str(idx): [idx] for idx in range(len(urls))}
+
+        await asyncio.gather(
+            *[
+                _send_group(base_url, indices)
+                if len(indices) > 1
+                else _send_one(indices[0])
+                for base_url, indices in groups.items()
+            ]
         )
         for r in responses:
-            await _log_context(r)
+            await _log_context(r)  # type: ignore[arg-type]
+
+        return responses  # type: ignore[return-value]
 
+    async def _send_batch(
+        self,
+        url: str,
+        models: list[PydanticModel],
+        timeout_sec: int = 10,
+        **kwargs: Any,
+    ) -> list[StdResponse[PydanticModel]] | None:
+        """Send many models to a single host in one request to its batch route.
+        Returns None if the host does not support it, or if the request failed
+        in a retryable way and the retry budget allows it, in which case the
+        caller should send each model on its own. Otherwise a failed request
+        fails every model."""
+        base_url = _base_url(url)
+        if base_url in self._batch_unsupported:
+            return None
+
+        budget = self._retry_budget
+        budget.record_attempt()
+        context_msg = f"url={base_url}, batch_size={len(models)}"
+        try:
+            await self._ensure_session()
+            _headers = await self._build_headers()
+            payload = compress_json(
+                [
+                    {
+                        "synapse": model.__class__.__name__,
+                        # NOTE: avoid a round trip through python objects
+                        "body": orjson.Fragment(model.model_dump_json()),
+                    }
+                    for model in models
+                ]
+            )
+            async with self._session.post(
+                f"{base_url}{BATCH_ROUTE}",
+                data=payload,
+                headers=_headers,
+                timeout=aiohttp.ClientTimeout(total=timeout_sec),
+            ) as client_resp:
+                if client_resp.status in (
+                    http.HTTPStatus.NOT_FOUND,
+                    http.HTTPStatus.METHOD_NOT_ALLOWED,
+                ):
+                    logger.warning(
+                        f"Host {base_url} does not support batching, falling back to individual requests"
+                    )
+                    self._batch_unsupported.add(base_url)
+                    return None
+                client_resp.raise_for_status()
+
+                # NOTE: the response carries every model, each within the
+                # limits registered for its synapse
+                limits = [self._size_limits(get_codec(type(model))) for model in models]
+                max_compressed_size = _total_limit(limit[0] for limit in limits)
+                max_decompressed_size = _total_limit(limit[1] for limit in limits)
+                response_json = orjson.loads(
+                    await read_decoded_response(
+                        client_resp,
+                        max_compressed_size=max_compressed_size,
+                        max_decompressed_size=max_decompressed_size,
+                    )
+                )
+                results: list[dict[str, Any]] = (response_json.get("body") or {}).get(
+                    "results", []
+                )
+                if len(results) != len(models):
+                    raise ValueError(
+                        f"Expected {len(models)} results from batch, got {len(results)}"
+                    )
+        except Exception as e:
+            # NOTE: the fallback re-sends every model, so it is charged to the
+            # retry budget like any other retry
+            if is_retryable(e) and budget.try_retry():
+                logger.warning(
+                    f"Batch request failed, falling back to individual requests, {context_msg}, exception: {e}"
+                )
+                return None
+            if not is_retryable(e):
+                budget.record_non_retryable()
+            logger.warning(f"Batch request failed, {context_msg}, exception: {e}")
+            return [
+                StdResponse(
+                    body=model.model_construct(),
+                    exception=retry_error(1, e),
+                    client_response=None,
+                )
+                for model in models
+            ]
+
+        logger.info(
+            f"Received batch response with status: {client_resp.status}, {context_msg}"
+        )
+        responses: list[StdResponse[PydanticModel]] = []
+        for model, result in zip(models, results):
+            status = result.get("status", http.HTTPStatus.OK)
+            if status >= http.HTTPStatus.BAD_REQUEST:
+                responses.append(
+                    StdResponse(
+                        body=model.model_construct(),
+                        error=result.get("error"),
+                        exception=SynapseStatusError(status, result.get("error")),
+                        client_response=client_resp,
+                    )
+                )
+                continue
+            responses.append(_parse_response(model, result, client_resp, context_msg))
         return responses
 
     async def send(
@@ -162,6 +618,8 @@ class Client:
         max_wait_sec: int = 4,
         wait_exponential_factor: int = 2,
         enable_preflight: bool = True,
+        stream: bool = False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
         **kwargs: Any,
     ) -> StdResponse[PydanticModel]:
         """Sends the following payload to the given URL.
@@ -172,28 +630,47 @@ class Client:
             url (str): url
             model (PydanticModel): model
             keypair (substrateinterface.Keypair): keypair
-            max_retries (int): max number of retries
+            max_retries (int): max number of attempts, only connection errors,
+                timeouts and 5xx responses are retried, and only while the
+                client's retry budget allows it
             max_wait_sec (int): max wait in unit of seconds
+            stream (bool): send the body as a chunked, incrementally compressed
+                stream and decompress the response incrementally, useful for
+                very large synapses
+            chunk_size (int): size of each chunk in streaming mode
 
         Returns:
             Response: Returns both the aiohttp Response, and the model that
                 was returned from the server
         """
         # NOTE: here we set some defaults to AT LEAST retry some
-        model_name = model.__class__.__name__
+        codec = get_codec(type(model))
+        model_name = codec.name
+        target_url = codec.url(_base_url(url))
+        max_compressed_size, max_decompressed_size = self._size_limits(codec)
         client_resp: aiohttp.ClientResponse | None = None
         context_msg = f"{url=}, {model_name=}, {max_retries=}, {max_wait_sec=}"
         try:
             await self._ensure_session()
-            async for attempt in AsyncRetrying(
-                stop=stop_after_attempt(max_retries),
-                wait=wait_exponential(
-                    multiplier=wait_exponential_factor, max=max_wait_sec
-                ),
-                before_sleep=retry_log,
-            ):
-                with attempt:
-                    target_url = _build_url(url, model)
+            delays = backoff_delays(max_retries, wait_exponential_factor, max_wait_sec)
+            budget = self._retry_budget
+            budget.record_attempt()
+            for attempt_number in range(1, len(delays) + 2):
+                try:
+                    if self._multiplex and (
+                        channel := await self._get_channel(url, timeout_sec)
+                    ):
+                        envelope = await channel.request(
+                            model,
+                            timeout_sec,
+                            max_compressed_size,
+                            max_decompressed_size,
+                        )
+                        status = envelope.get("status", http.HTTPStatus.OK)
+                        if status >= http.HTTPStatus.BAD_REQUEST:
+                            # raise exception so we can retry
+                            raise SynapseStatusError(status, envelope.get("error"))
+                        return _parse_response(model, envelope, None, context_msg)
 
                     if enable_preflight:
                         _head_headers = await self._build_headers(
@@ -208,7 +685,13 @@ class Client:
                             logger.debug(f"HEAD preflight successful for {target_url}")
 
                     _headers = await self._build_headers()
-                    payload = encode_body(model, _headers)
+                    if stream:
+                        _headers[STREAM_HEADER] = "1"
+                        payload = iter_encoded_body(model, _headers, chunk_size)
+                    else:
+                        payload = codec.encode(
+                            model, compress="content-encoding" in _headers
+                        )
                     async with self._session.post(
                         target_url,
                         data=payload,
@@ -221,85 +704,42 @@ class Client:
                         logger.info(
                             f"Received response with status: {client_resp.status}, {context_msg}"
                         )
-                        response_json = {}
-                        try:
-                            if (
-                                client_resp.headers.get("content-encoding", "").lower()
-                                == "zstd"
-                            ):
-                                logger.debug(
-                                    f"Attempting zstd decoding for {model_name}"
-                                )
-                                response_bytes = await client_resp.read()
-                                dctx = zstd.ZstdDecompressor()
-                                decompressed_bytes = dctx.decompress(response_bytes)
-                                response_text = decompressed_bytes.decode()
-                                response_json = orjson.loads(response_text)
-                                logger.debug(
-                                    f"Successfully parsed JSON: {response_json}, type: {type(response_json)}, {context_msg}"
-                                )
-                            else:
-                                response_json = await client_resp.json()
-                        except JSONDecodeError as e:
-                            logger.error(
-                                f"Failed to decode response: {await client_resp.text()}, {context_msg}, exception: {e}"
+                        if stream:
+                            logger.debug(
+                                f"Attempting streamed decoding for {model_name}"
+                            )
+                            response_bytes = await read_decoded_response(
+                                client_resp,
+                                chunk_size,
+                                max_compressed_size,
+                                max_decompressed_size,
                             )
-                            raise
-
-                        if not response_json:
-                            logger.warning("Empty response JSON received")
-                            return StdResponse(
-                                # NOTE: here we're creating an empty instance
-                                body=model.model_construct(),
-                                exception=ValueError(
-                                    f"Empty response JSON received for {model_name}"
-                                ),
-                                client_response=client_resp,
+                        else:
+                            response_bytes = await read_response(
+                                client_resp, max_compressed_size, max_decompressed_size
                             )
 
-                        try:
-                            error: str | None = response_json.get("error", None)
-                            metadata: dict[str, Any] = response_json.get("metadata", {})
-                            body: dict[str, Any] = response_json.get("body", {})
-
-                            if body:
-                                try:
-                                    # parse object to the specific model
-                                    pydantic_model = model.model_validate(body)
-                                    logger.success(
-                                        f"Successfully received response, {context_msg}"
-                                    )
-                                    return StdResponse(
-                                        body=pydantic_model,
-                                        error=error,
-                                        metadata=metadata,
-                                        client_response=client_resp,
-                                    )
-                                except Exception as e:
-                                    logger.error(
-                                        f"Failed to validate model with body: {e}, returning the raw body"
-                                    )
-                                    # Return the raw body if validation fails
-                                    return StdResponse(
-                                        body=model.model_construct(**body),
-                                        error=error,
-                                        metadata=metadata,
-                                        client_response=client_resp,
-                                    )
-                            else:
-                                logger.warning(
-                                    "Response body is empty, skipped parsing."
-                                )
-                                return StdResponse(
-                                    body=model.model_construct(),
-                                    error=error,
-                                    metadata=metadata,
-                                    client_response=client_resp,
-                                )
-
-                        except JSONDecodeError as e:
-                            logger.error(f"Failed to decode response: {e}")
-                            raise
+                        return _decode_response(
+                            codec, model, response_bytes, client_resp, context_msg
+                        )
+                except PayloadTooLargeError:
+                    # NOTE: not a failed attempt, the response was refused
+                    raise
+                except Exception as e:
+                    if not is_retryable(e):
+                        budget.record_non_retryable()
+                        raise retry_error(attempt_number, e)
+                    if attempt_number > len(delays):
+                        raise retry_error(attempt_number, e)
+                    if not budget.try_retry():
+                        logger.debug(
+                            f"Retry budget exhausted, not retrying {model_name} after attempt {attempt_number} due to: {e}"
+                        )
+                        raise retry_error(attempt_number, e)
+                    logger.debug(
+                        f"Retrying {model_name} attempt {attempt_number} due to: {e}"
+                    )
+                    await asyncio.sleep(delays[attempt_number - 1])
 
             return StdResponse(
                 body=model.model_construct(),
@@ -335,7 +775,108 @@ class Client:
                 body=model.model_construct(), exception=e, client_response=client_resp
             )
 
+    async def stream(
+        self,
+        url: str,
+        model: PydanticModel,
+        timeout_sec: int = 10,
+        enable_preflight: bool = True,
+        **kwargs: Any,
+    ) -> AsyncIterator[StdResponse[PydanticModel]]:
+        """Sends the payload to a synapse served by an async generator handler,
+        and yields each partial result as soon as it arrives.
+
+        Unlike `send`, requests are not retried since partial results may have
+        already been consumed. Failures are yielded as a final `StdResponse`
+        with `exception` set. If the synapse isn't served by an async generator,
+        its response is yielded as a single result.
+
+        Args:
+            url (str): url
+            model (PydanticModel): model
+            timeout_sec (int): max time to wait between two partial results
+
+        Yields:
+            StdResponse: each partial result, with the body parsed to the same
+                type as `model`
+        """
+        codec = get_codec(type(model))
+        model_name = codec.name
+        max_compressed_size, max_decompressed_size = self._size_limits(codec)
+        client_resp: aiohttp.ClientResponse | None = None
+        context_msg = f"{url=}, {model_name=}"
+        # NOTE: long running handlers may take a while in total, so only bound
+        # the time between two partial results
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=timeout_sec)
+        try:
+            await self._ensure_session()
+            target_url = codec.url(_base_url(url))
+            if enable_preflight:
+                _head_headers = await self._build_headers(include_compression=False)
+                async with self._session.head(
+                    target_url, headers=_head_headers, timeout=timeout
+                ) as head_resp:
+                    head_resp.raise_for_status()
+                    logger.debug(f"HEAD preflight successful for {target_url}")
+
+            _headers = await self._build_headers()
+            async with self._session.post(
+                target_url,
+                data=codec.encode(model, compress="content-encoding" in _headers),
+                headers=_headers,
+                timeout=timeout,
+            ) as client_resp:
+                client_resp.raise_for_status()
+                if not client_resp.headers.get("content-type", "").startswith(
+                    FRAMED_STREAM_MEDIA_TYPE
+                ):
+                    # NOTE: the synapse isn't served by an async generator, its
+                    # whole response is a single result
+                    logger.warning(
+                        f"Expected a framed stream but got a single response, {context_msg}"
+                    )
+                    response_bytes = await read_response(
+                        client_resp, max_compressed_size, max_decompressed_size
+                    )
+                    yield _decode_response(
+                        codec, model, response_bytes, client_resp, context_msg
+                    )
+                    return
+
+                logger.info(
+                    f"Receiving streamed response with status: {client_resp.status}, {context_msg}"
+                )
+                async for envelope in iter_frames(
+                    client_resp, max_compressed_size, max_decompressed_size
+                ):
+                    body: dict[str, Any] = envelope.get("body") or {}
+                    try:
+                        partial = codec.validate(body)
+                    except Exception as e:
+                        logger.error(
+                            f"Failed to validate partial result: {e}, returning the raw body"
+                        )
+                        partial = model.model_construct(**body)
+                    yield StdResponse(
+                        body=partial,
+                        error=envelope.get("error"),
+                        metadata=envelope.get("metadata") or {},
+                        client_response=client_resp,
+                    )
+                logger.success(f"Finished receiving streamed response, {context_msg}")
+        except asyncio.CancelledError:
+            logger.warning(f"Stream from {url} was cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Error while streaming from {url}: {e}")
+            yield StdResponse(
+                body=model.model_construct(), exception=e, client_response=client_resp
+            )
+
     async def close(self):
+        for channel in self._channels.values():
+            await channel.close()
+        self._channels.clear()
         try:
             await self._session.close()
         except Exception:
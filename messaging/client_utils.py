@@ -0,0 +1,209 @@
+import asyncio
+import struct
+from typing import Any, AsyncIterator
+
+import aiohttp
+import orjson
+import zstandard as zstd
+from pydantic import BaseModel
+
+from .exceptions import PayloadTooLargeError
+
+# NOTE: helpers in this module are shared by the client and the server, and
+# must not depend on FastAPI so that client-only processes don't load it
+
+# NOTE: upper bound on how much of a payload is held in memory at once while
+# compressing/decompressing in streaming mode
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# NOTE: each frame of a framed stream is prefixed by its length as a 4 byte
+# big-endian unsigned int
+FRAME_PREFIX = struct.Struct(">I")
+# NOTE: each multiplexed message is prefixed by its request ID as an 8 byte
+# big-endian unsigned int, outside of the compressed payload, so that a
+# message which can't be decoded still fails its own request
+MESSAGE_ID = struct.Struct(">Q")
+# NOTE: default limits on the size of a body as received, and once
+# decompressed, None disables a limit. Limits are opt-in, so that peers already
+# exchanging very large synapses keep working.
+DEFAULT_MAX_COMPRESSED_SIZE: int | None = None
+DEFAULT_MAX_DECOMPRESSED_SIZE: int | None = None
+
+
+def check_size(size: int | None, limit: int | None, kind: str) -> None:
+    """Raise `PayloadTooLargeError` if both are known and size exceeds limit"""
+    if size is not None and limit is not None and size > limit:
+        raise PayloadTooLargeError(size, limit, kind)
+
+
+class _BoundedSink:
+    def __init__(self, limit: int | None) -> None:
+        self.data = bytearray()
+        self.limit = limit
+
+    def write(self, data: bytes) -> int:
+        check_size(len(self.data) + len(data), self.limit, "decompressed")
+        self.data += data
+        return len(data)
+
+
+class BoundedDecompressor:
+    """Incremental zstd decompressor that raises `PayloadTooLargeError` as soon
+    as the output exceeds `max_size`, output is produced at most `chunk_size`
+    bytes at a time so that a very compressible body is never fully inflated"""
+
+    def __init__(
+        self, max_size: int | None, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> None:
+        self._sink = _BoundedSink(max_size)
+        self._writer = zstd.ZstdDecompressor().stream_writer(
+            self._sink, write_size=chunk_size, closefd=False
+        )
+
+    def decompress(self, data: bytes) -> None:
+        self._writer.write(data)
+
+    def result(self) -> bytearray:
+        # NOTE: not copied into bytes, which would double the peak memory of
+        # large bodies, orjson and pydantic parse bytearrays as well
+        return self._sink.data
+
+
+def decompress_limited(data: bytes, max_size: int | None) -> bytes | bytearray:
+    """Decompress a whole zstd body, without ever allocating more than
+    `max_size` bytes for the output"""
+    if max_size is None:
+        return zstd.ZstdDecompressor().decompress(data)
+    # NOTE: -1 when the frame doesn't declare its content size
+    declared_size = zstd.frame_content_size(data)
+    check_size(declared_size, max_size, "decompressed")
+    if declared_size >= 0:
+        return zstd.ZstdDecompressor().decompress(data)
+    decompressor = BoundedDecompressor(max_size)
+    decompressor.decompress(data)
+    return decompressor.result()
+
+
+def compress_json(content: Any) -> bytes:
+    """Serialize `content` with orjson and compress it as a single zstd frame"""
+    return zstd.ZstdCompressor(level=3).compress(orjson.dumps(content))
+
+
+def decompress_json(data: bytes, max_size: int | None = None) -> Any:
+    """Inverse of `compress_json`"""
+    return orjson.loads(decompress_limited(data, max_size))
+
+
+def encode_body(model: BaseModel, headers: dict[str, Any]) -> bytes:
+    content_encoding = headers.get("content-encoding")
+    if content_encoding:
+        if content_encoding.lower() == "zstd":
+            json_data = model.model_dump_json().encode()
+            compressor = zstd.ZstdCompressor(level=3)
+            compressed = compressor.compress(json_data)
+            return compressed
+        else:
+            raise NotImplementedError(
+                f"Content encoding of type {content_encoding} is not supported at the moment"
+            )
+
+    return model.model_dump_json().encode()
+
+
+async def iter_encoded_body(
+    model: BaseModel,
+    headers: dict[str, Any],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    """Streaming counterpart of `encode_body`, yields the serialized model in
+    chunks of at most `chunk_size`, compressing each chunk incrementally so the
+    full compressed payload is never held in memory"""
+    content_encoding = headers.get("content-encoding")
+    if content_encoding and content_encoding.lower() != "zstd":
+        raise NotImplementedError(
+            f"Content encoding of type {content_encoding} is not supported at the moment"
+        )
+
+    json_data = memoryview(model.__pydantic_serializer__.to_json(model))
+    if not content_encoding:
+        for offset in range(0, len(json_data), chunk_size):
+            yield bytes(json_data[offset : offset + chunk_size])
+        return
+
+    compressor = zstd.ZstdCompressor(level=3).compressobj()
+    for offset in range(0, len(json_data), chunk_size):
+        compressed = compressor.compress(json_data[offset : offset + chunk_size])
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _is_zstd(client_resp: aiohttp.ClientResponse) -> bool:
+    return client_resp.headers.get("content-encoding", "").lower() == "zstd"
+
+
+async def read_decoded_response(
+    client_resp: aiohttp.ClientResponse,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_compressed_size: int | None = None,
+    max_decompressed_size: int | None = None,
+) -> bytes | bytearray:
+    """Read a response body chunk by chunk, decompressing zstd incrementally.
+    Raises `PayloadTooLargeError` as soon as either limit is exceeded."""
+    check_size(client_resp.content_length, max_compressed_size, "compressed")
+    received = 0
+    if not _is_zstd(client_resp):
+        body = bytearray()
+        async for chunk in client_resp.content.iter_chunked(chunk_size):
+            received += len(chunk)
+            check_size(received, max_compressed_size, "compressed")
+            check_size(received, max_decompressed_size, "decompressed")
+            body += chunk
+        return body
+
+    decompressor = BoundedDecompressor(max_decompressed_size, chunk_size)
+    async for chunk in client_resp.content.iter_chunked(chunk_size):
+        received += len(chunk)
+        check_size(received, max_compressed_size, "compressed")
+        decompressor.decompress(chunk)
+    return decompressor.result()
+
+
+async def read_response(
+    client_resp: aiohttp.ClientResponse,
+    max_compressed_size: int | None = None,
+    max_decompressed_size: int | None = None,
+) -> bytes | bytearray:
+    """Read and decode a whole response body in one go when its size is known
+    and within limits, otherwise chunk by chunk with `read_decoded_response`"""
+    if client_resp.content_length is None:
+        return await read_decoded_response(
+            client_resp,
+            max_compressed_size=max_compressed_size,
+            max_decompressed_size=max_decompressed_size,
+        )
+    check_size(client_resp.content_length, max_compressed_size, "compressed")
+    data = await client_resp.read()
+    if _is_zstd(client_resp):
+        return decompress_limited(data, max_decompressed_size)
+    check_size(len(data), max_decompressed_size, "decompressed")
+    return data
+
+
+async def iter_frames(
+    client_resp: aiohttp.ClientResponse,
+    max_compressed_size: int | None = None,
+    max_decompressed_size: int | None = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """Read length-prefixed zstd frames from a response, yielding each decoded
+    envelope as soon as it has fully arrived. Limits apply to each frame."""
+    while True:
+        try:
+            prefix = await client_resp.content.readexactly(FRAME_PREFIX.size)
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise
+            return
+        (frame_size,) = FRAME_PREFIX.unpack(prefix)
+        check_size(frame_size, max_compressed_size, "compressed")
+        frame = await client_resp.content.readexactly(frame_size)
+        yield decompress_json(frame, max_decompressed_size)
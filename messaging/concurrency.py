@@ -0,0 +1,157 @@
+import asyncio
+import math
+import time
+from collections import deque
+
+from pydantic import BaseModel
+
+
+class LimiterMetrics(BaseModel):
+    """Counters for an adaptive concurrency limiter"""
+
+    limit: float = 0.0
+    in_flight: int = 0
+    waiting: int = 0
+    completed: int = 0
+    overloaded: int = 0
+    decreases: int = 0
+    short_latency_ms: float = 0.0
+    baseline_latency_ms: float = 0.0
+
+
+class AdaptiveLimiter:
+    """Limits how many requests may be in flight at once, and adapts the limit
+    from the latency and failures of completed requests (AIMD).
+
+    While the recent average latency stays within `tolerance` of the baseline
+    latency, the limit grows by about `sqrt(limit)` every `limit` completed
+    requests. Once requests become slower, whether because miners, the
+    connection pool or the local event loop are saturated, or on connection
+    errors, timeouts and 5xx responses, the limit is multiplied by
+    `backoff_ratio`. Decreases happen at most once per recent average latency,
+    so that a burst of slow or failed requests doesn't collapse the limit to
+    `min_limit` at once.
+
+    Args:
+        initial_limit (int): limit before any request completed
+        min_limit (int): the limit never goes below this
+        max_limit (int): the limit never goes above this
+        tolerance (float): how much slower than usual recent requests may be
+            before the limit shrinks
+        backoff_ratio (float): factor applied to the limit when it shrinks
+        short_window (int): number of requests the recent average latency is
+            roughly taken over
+        long_window (int): number of requests it takes the baseline latency
+            to follow slower latencies
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 32,
+        min_limit: int = 1,
+        max_limit: int = 1024,
+        tolerance: float = 1.5,
+        backoff_ratio: float = 0.9,
+        short_window: int = 10,
+        long_window: int = 500,
+    ) -> None:
+        assert 0 < min_limit <= initial_limit <= max_limit, (
+            "expected 0 < min_limit <= initial_limit <= max_limit"
+        )
+        assert 0.0 < backoff_ratio < 1.0, "backoff_ratio must be between 0 and 1"
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff_ratio = backoff_ratio
+        self._short_alpha = 2 / (short_window + 1)
+        self._long_alpha = 2 / (long_window + 1)
+        self._short_latency = 0.0
+        self._baseline = 0.0
+        self._last_decrease = 0.0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self.metrics = LimiterMetrics(limit=initial_limit)
+
+    @property
+    def limit(self) -> int:
+        return int(self.metrics.limit)
+
+    async def acquire(self) -> float:
+        """Wait for a free slot, returns the start time to pass to `release`"""
+        metrics = self.metrics
+        if metrics.in_flight >= self.limit or self._waiters:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+            metrics.waiting += 1
+            try:
+                await future
+            except asyncio.CancelledError:
+                # NOTE: a slot may have been handed to us just before cancelling
+                if future.done() and not future.cancelled():
+                    metrics.in_flight -= 1
+                    self._wake()
+                raise
+            finally:
+                metrics.waiting -= 1
+        else:
+            metrics.in_flight += 1
+        return time.monotonic()
+
+    def release(self, start: float, overloaded: bool | None = False) -> None:
+        """Free the slot and adapt the limit, `overloaded` is None when the
+        outcome says nothing about load (e.g. the request was cancelled)"""
+        metrics = self.metrics
+        metrics.in_flight -= 1
+        if overloaded is not None:
+            self._update(time.monotonic() - start, overloaded)
+        self._wake()
+
+    def _update(self, latency: float, overloaded: bool) -> None:
+        metrics = self.metrics
+        metrics.completed += 1
+        if overloaded:
+            metrics.overloaded += 1
+            self._decrease()
+            return
+
+        if not self._short_latency:
+            self._short_latency = self._baseline = latency
+        else:
+            self._short_latency += self._short_alpha * (latency - self._short_latency)
+            # NOTE: follow faster latencies at once, but slower ones only
+            # gradually, so that a miner which became permanently slower
+            # doesn't pin the limit to `min_limit`
+            if self._short_latency < self._baseline:
+                self._baseline = self._short_latency
+            else:
+                self._baseline += self._long_alpha * (
+                    self._short_latency - self._baseline
+                )
+        metrics.short_latency_ms = self._short_latency * 1000
+        metrics.baseline_latency_ms = self._baseline * 1000
+
+        if self._short_latency > self.tolerance * self._baseline:
+            self._decrease()
+        # NOTE: don't grow while the caller doesn't even use half of the limit
+        elif metrics.in_flight + 1 >= metrics.limit / 2:
+            # about sqrt(limit) more per `limit` completed requests
+            metrics.limit = min(
+                self.max_limit, metrics.limit + 1 / math.sqrt(metrics.limit)
+            )
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self._short_latency:
+            return
+        self._last_decrease = now
+        metrics = self.metrics
+        metrics.decreases += 1
+        metrics.limit = max(self.min_limit, metrics.limit * self.backoff_ratio)
+
+    def _wake(self) -> None:
+        metrics = self.metrics
+        while self._waiters and metrics.in_flight < self.limit:
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            metrics.in_flight += 1
+            future.set_result(None)
@@ -4,3 +4,36 @@ class InvalidSignatureException(Exception):
     def __init__(self, message: str):
         self.message = message
         super().__init__(self.message)
+
+
+class SynapseStatusError(Exception):
+    """Exception raised when a synapse request sent over a shared connection
+    or batch returns an error status code"""
+
+    def __init__(self, status: int, message: str):
+        self.status = status
+        self.message = message
+        super().__init__(f"{status}, message={message!r}")
+
+
+class WorkerRequestError(Exception):
+    """Exception raised by a request sent from a worker process of
+    `ShardedClient`, only its type name and message are sent back"""
+
+    def __init__(self, type_name: str, message: str):
+        self.type_name = type_name
+        self.message = message
+        super().__init__(f"{type_name}: {message}")
+
+
+class PayloadTooLargeError(Exception):
+    """Exception raised as soon as a body exceeds its configured maximum size,
+    before it is fully read or decompressed"""
+
+    def __init__(self, size: int, limit: int, kind: str):
+        self.size = size
+        self.limit = limit
+        self.kind = kind
+        super().__init__(
+            f"{kind} body of at least {size} bytes exceeds the limit of {limit} bytes"
+        )
@@ -0,0 +1,85 @@
+import logging
+import queue
+import threading
+from typing import Any, TextIO
+
+
+class BackgroundSink:
+    """Loguru sink that hands formatted messages to a background thread, which
+    writes them to `stream`, so that the event loop never blocks on I/O.
+
+    Messages are dropped, and counted in `dropped`, once `max_queue_size`
+    messages are waiting to be written, rather than blocking the caller.
+
+        logger.add(BackgroundSink(sys.stderr), colorize=sys.stderr.isatty())
+    """
+
+    _STOP = object()
+
+    def __init__(self, stream: TextIO, max_queue_size: int = 10_000) -> None:
+        self._stream = stream
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=max_queue_size)
+        self.dropped = 0
+        self._thread = threading.Thread(
+            target=self._run, name="loguru-background-sink", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, message: str) -> None:
+        try:
+            self._queue.put_nowait(str(message))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            message = self._queue.get()
+            if message is self._STOP:
+                break
+            try:
+                self._stream.write(message)
+                # NOTE: only flush once the backlog is drained
+                if self._queue.empty():
+                    self._stream.flush()
+            except Exception:
+                pass
+        try:
+            self._stream.flush()
+        except Exception:
+            pass
+
+    def stop(self) -> None:
+        """Called by loguru when the sink is removed, writes out the backlog"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(self._STOP)
+        self._thread.join(timeout=5)
+
+
+class AccessLogSampler(logging.Filter):
+    """Keeps `sample_rate` of successful uvicorn access log records, evenly
+    spaced rather than random. Records with an error status are always kept."""
+
+    def __init__(self, sample_rate: float = 1.0) -> None:
+        super().__init__()
+        assert 0.0 <= sample_rate <= 1.0, "sample_rate must be between 0 and 1"
+        self.sample_rate = sample_rate
+        self._credit = 0.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.sample_rate >= 1.0:
+            return True
+        # NOTE: uvicorn access logs are formatted with
+        # (client_addr, method, full_path, http_version, status_code)
+        args = record.args
+        if isinstance(args, tuple) and len(args) == 5:
+            status_code = args[4]
+            if isinstance(status_code, int) and status_code >= 400:
+                return True
+
+        self._credit += self.sample_rate
+        # NOTE: tolerate float rounding, e.g. ten increments of 0.1
+        if self._credit >= 1.0 - 1e-9:
+            self._credit -= 1.0
+            return True
+        return False
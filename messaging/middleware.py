@@ -1,17 +1,29 @@
 import http
-from typing import Awaitable, Callable
+from typing import AsyncIterator, Awaitable, Callable
 
 from starlette.types import ASGIApp
 import zstandard as zstd
 from fastapi import Request, Response
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from kami import KamiClient
 from loguru import logger
 from starlette.concurrency import iterate_in_threadpool
 from starlette.middleware.base import BaseHTTPMiddleware
 
-from .types import HOTKEY_HEADER, MESSAGE_HEADER, SIGNATURE_HEADER
+from .exceptions import PayloadTooLargeError
+from .registry import get_codec_for_route
+from .types import (
+    FRAMED_STREAM_MEDIA_TYPE,
+    HOTKEY_HEADER,
+    MESSAGE_HEADER,
+    SIGNATURE_HEADER,
+    STREAM_HEADER,
+)
+from .verification import VerificationDispatcher
 from .utils import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_MAX_COMPRESSED_SIZE,
+    DEFAULT_MAX_DECOMPRESSED_SIZE,
     create_response,
     decode_body,
 )
@@ -25,9 +37,13 @@ class SignatureMiddleware(BaseHTTPMiddleware):
         app: ASGIApp,
         kami: KamiClient,
         whitelisted_routes: list[str] | None = None,
+        verifier: VerificationDispatcher | None = None,
     ):
         super().__init__(app)
         self.kami = kami
+        # NOTE: coalesces concurrent verify calls instead of one round-trip to
+        # Kami per request
+        self.verifier = verifier or VerificationDispatcher(kami)
         self.whitelisted_routes = whitelisted_routes or []
         # always whitelisted
         if "/docs" not in self.whitelisted_routes:
@@ -48,7 +64,7 @@ class SignatureMiddleware(BaseHTTPMiddleware):
                     got: {hotkey=}, {signature=}, {message=}"
             return create_response(body={}, status_code=400, error=message)
 
-        if not await self.kami.verify(
+        if not await self.verifier.verify(
             hotkey=hotkey, message=message, signature=signature
         ):
             return create_response(
@@ -68,12 +84,29 @@ class ZstdMiddleware(BaseHTTPMiddleware):
     This middleware:
     1. Decompresses incoming request bodies with content-encoding: zstd
     2. Compresses outgoing response bodies when Accept-Encoding includes zstd
+    3. Streams the compressed response in chunks when the client sent the
+       `x-stream` header, instead of compressing the whole body at once
+    4. Passes framed partial result streams through as-is, since each frame is
+       already compressed
+    5. Rejects request bodies larger than `max_compressed_size` as received, or
+       `max_decompressed_size` once decompressed, with 413 as soon as either
+       is exceeded. Limits set on a synapse's codec take precedence.
 
     NOTE: The /docs endpoint is excluded from compression/decompression.
     """
 
-    def __init__(self, app: ASGIApp, whitelisted_routes: list[str] | None = None):
+    def __init__(
+        self,
+        app: ASGIApp,
+        whitelisted_routes: list[str] | None = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_compressed_size: int | None = DEFAULT_MAX_COMPRESSED_SIZE,
+        max_decompressed_size: int | None = DEFAULT_MAX_DECOMPRESSED_SIZE,
+    ):
         super().__init__(app)
+        self.chunk_size = chunk_size
+        self.max_compressed_size = max_compressed_size
+        self.max_decompressed_size = max_decompressed_size
         self.whitelisted_routes = whitelisted_routes or []
         # always whitelisted
         if "/docs" not in self.whitelisted_routes:
@@ -90,23 +123,56 @@ class ZstdMiddleware(BaseHTTPMiddleware):
         if request.method == "HEAD":
             return await call_next(request)
 
+        max_compressed_size = self.max_compressed_size
+        max_decompressed_size = self.max_decompressed_size
+        codec = get_codec_for_route(request.url.path)
+        if codec is not None:
+            if codec.max_compressed_size is not None:
+                max_compressed_size = codec.max_compressed_size
+            if codec.max_decompressed_size is not None:
+                max_decompressed_size = codec.max_decompressed_size
+
         encoding = request.headers.get("content-encoding", "").lower()
-        if encoding == "zstd":
-            decompressed_body = await decode_body(request)
-            # NOTE: this probably won't work for streaming
+        has_limits = (
+            max_compressed_size is not None or max_decompressed_size is not None
+        )
+        if encoding == "zstd" or has_limits:
+            try:
+                decompressed_body = await decode_body(
+                    request, max_compressed_size, max_decompressed_size
+                )
+            except PayloadTooLargeError as e:
+                logger.warning(f"Rejected request to {request.url.path}: {e}")
+                return create_response(
+                    body={},
+                    status_code=http.HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                    error=str(e),
+                )
+            # NOTE: the body was consumed from the stream, cache it so that
+            # downstream handlers can still call `request.body()`
             request._body = decompressed_body  # pyright: ignore[reportPrivateUsage]
-            logger.debug("Server decompressed request body")
+            logger.debug("Server decoded request body")
 
         # Process the request
         response = await call_next(request)
         logger.debug(f"raw response: {response=}")
 
+        # NOTE: framed streams compress each frame themselves, pass them through
+        # untouched so that partial results are not buffered
+        if response.headers.get("content-type", "").startswith(
+            FRAMED_STREAM_MEDIA_TYPE
+        ):
+            return response
+
+        accept_encoding = request.headers.get("accept-encoding", "").lower()
+        if "zstd" in accept_encoding and request.headers.get(STREAM_HEADER):
+            return self._stream_compressed(response)
+
         response_body = [section async for section in response.body_iterator]  # type: ignore
         response.body_iterator = iterate_in_threadpool(iter(response_body))  # type: ignore
         bytes_response = response_body[0]  # type: ignore
         logger.debug(f"response_body={bytes_response.decode()}")
 
-        accept_encoding = request.headers.get("accept-encoding", "").lower()
         if response_body and "zstd" in accept_encoding:
             compressed_body = compressor.compress(bytes_response)
 
@@ -133,3 +199,31 @@ class ZstdMiddleware(BaseHTTPMiddleware):
             )
 
         return response
+
+    def _stream_compressed(self, response: Response) -> StreamingResponse:
+        """Compress the response body section by section as it is sent, so the
+        full compressed body is never buffered"""
+        chunk_size = self.chunk_size
+
+        async def _compress_sections() -> AsyncIterator[bytes]:
+            compressobj = zstd.ZstdCompressor(level=3).compressobj()
+            async for section in response.body_iterator:  # type: ignore
+                view = memoryview(section)  # type: ignore
+                for offset in range(0, len(view), chunk_size):
+                    compressed = compressobj.compress(
+                        view[offset : offset + chunk_size]
+                    )
+                    if compressed:
+                        yield compressed
+            yield compressobj.flush()
+
+        headers = {
+            k: v for k, v in response.headers.items() if k.lower() != "content-length"
+        }
+        headers["content-encoding"] = "zstd"
+        logger.debug("Streaming compressed response")
+        return StreamingResponse(
+            content=_compress_sections(),
+            status_code=response.status_code,
+            headers=headers,
+        )
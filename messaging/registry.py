@@ -0,0 +1,112 @@
+from typing import Any, Generic, Type
+
+import zstandard as zstd
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+
+from .types import PydanticModel
+
+
+class SynapseCodec(Generic[PydanticModel]):
+    """Everything about a synapse that only depends on its model class, compiled
+    once and reused for every request: the route, validators for the payload
+    and for the typed {body, error, metadata} envelope, compression settings
+    and size limits.
+
+    `max_compressed_size` and `max_decompressed_size` override the limits of
+    the client and server on bodies of this synapse, None keeps theirs."""
+
+    def __init__(
+        self,
+        model: Type[PydanticModel],
+        compression_level: int = 3,
+        max_compressed_size: int | None = None,
+        max_decompressed_size: int | None = None,
+    ) -> None:
+        self.model = model
+        self.name = model.__name__
+        self.route = "/" + self.name.lstrip("/").rstrip("/")
+        self.compression_level = compression_level
+        self.max_compressed_size = max_compressed_size
+        self.max_decompressed_size = max_decompressed_size
+        self.adapter: TypeAdapter[PydanticModel] = TypeAdapter(model)
+        # NOTE: all keys are optional so that error responses with an empty
+        # body still validate
+        envelope = TypedDict(  # type: ignore[misc]
+            f"{self.name}Envelope",
+            {"body": model, "error": str | None, "metadata": dict[str, Any]},
+            total=False,
+        )
+        self.envelope_adapter: TypeAdapter[dict[str, Any]] = TypeAdapter(envelope)
+        self._compressor = zstd.ZstdCompressor(level=compression_level)
+
+    def url(self, base_url: str) -> str:
+        """Full URL of the synapse given an already normalized base URL"""
+        return f"{base_url}{self.route}"
+
+    def validate(self, data: Any) -> PydanticModel:
+        return self.adapter.validate_python(data)
+
+    def validate_json(self, data: bytes | bytearray) -> PydanticModel:
+        return self.adapter.validate_json(data)
+
+    def serialize(self, model: PydanticModel) -> bytes:
+        return self.adapter.dump_json(model)
+
+    def encode(self, model: PydanticModel, compress: bool = True) -> bytes:
+        """Serialize the model as a request body, compressed with zstd"""
+        if not compress:
+            return self.serialize(model)
+        return self._compressor.compress(self.serialize(model))
+
+    def decode_envelope(self, data: bytes | bytearray) -> dict[str, Any]:
+        """Parse and validate a {body, error, metadata} envelope in a single
+        pass, the body is returned as an instance of the model. Raises
+        `pydantic.ValidationError` if the envelope or the body is invalid."""
+        return self.envelope_adapter.validate_json(data)
+
+    def dump_envelope(
+        self,
+        body: PydanticModel,
+        error: str | None = None,
+        metadata: dict[str, Any] = {},
+    ) -> bytes:
+        return self.envelope_adapter.dump_json(
+            {"body": body, "error": error, "metadata": metadata}
+        )
+
+
+_CODECS: dict[type, SynapseCodec[Any]] = {}
+_CODECS_BY_ROUTE: dict[str, SynapseCodec[Any]] = {}
+
+
+def get_codec(model: Type[PydanticModel]) -> SynapseCodec[PydanticModel]:
+    """Get the codec of a synapse, compiling it on first use"""
+    codec = _CODECS.get(model)
+    if codec is None:
+        codec = _CODECS[model] = SynapseCodec(model)
+        _CODECS_BY_ROUTE[codec.route] = codec
+    return codec
+
+
+def get_codec_for_route(route: str) -> SynapseCodec[Any] | None:
+    """Get the codec of the synapse served at `route`, if any was compiled"""
+    return _CODECS_BY_ROUTE.get(route)
+
+
+def register_synapse(
+    model: Type[PydanticModel],
+    compression_level: int = 3,
+    max_compressed_size: int | None = None,
+    max_decompressed_size: int | None = None,
+) -> SynapseCodec[PydanticModel]:
+    """Compile the codec of a synapse ahead of time, optionally overriding its
+    default compression settings and size limits"""
+    codec = _CODECS[model] = SynapseCodec(
+        model,
+        compression_level=compression_level,
+        max_compressed_size=max_compressed_size,
+        max_decompressed_size=max_decompressed_size,
+    )
+    _CODECS_BY_ROUTE[codec.route] = codec
+    return codec
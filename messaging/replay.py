@@ -0,0 +1,266 @@
+"""Replay a capture recorded with `Server(capture_path=...)`.
+
+Requests are fed either through the whole app, middlewares included, or
+straight into the route handlers, at their original pace scaled by `--speed`
+(0 replays as fast as possible), and latency and throughput are reported.
+
+Usage:
+    python -m messaging.replay capture.bin --server my_miner.main:server --speed 10
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from importlib import import_module
+from typing import Any, Literal
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
+from loguru import logger
+from pydantic import BaseModel
+from starlette.middleware import Middleware
+from starlette.requests import Request
+
+from .capture import CapturedRequest, read_capture
+from .middleware import SignatureMiddleware
+from .server import Server
+from .types import SIGNATURE_HEADER
+from .verification import VerificationDispatcher
+
+ReplayTarget = Literal["server", "handler"]
+
+
+class ReplayReport(BaseModel):
+    """Latency and throughput of a replayed capture"""
+
+    requests: int = 0
+    errors: int = 0
+    status_codes: dict[int, int] = {}
+    duration_sec: float = 0.0
+    throughput_rps: float = 0.0
+    latency_p50_ms: float = 0.0
+    latency_p90_ms: float = 0.0
+    latency_p99_ms: float = 0.0
+    latency_max_ms: float = 0.0
+    # handler time of the same requests when they were captured
+    captured_handler_p50_ms: float | None = None
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _route_endpoints(app: FastAPI) -> dict[str, Any]:
+    return {
+        route.path.lstrip("/"): route.endpoint
+        for route in app.routes
+        if isinstance(route, APIRoute)
+    }
+
+
+def _trusting_app(app: FastAPI) -> FastAPI:
+    """An app sharing the routes, state, exception handlers and middlewares of
+    `app`, except that its `SignatureMiddleware` accepts any signature. The
+    verifier of `app` is left untouched, so live traffic is still verified."""
+    replay_app = FastAPI()
+    replay_app.router = app.router
+    replay_app.state = app.state
+    replay_app.exception_handlers = dict(app.exception_handlers)
+    replay_app.user_middleware = []
+    for middleware in app.user_middleware:
+        if middleware.cls is SignatureMiddleware:
+            kwargs = dict(middleware.kwargs)
+            kwargs["verifier"] = VerificationDispatcher(
+                kwargs.get("kami"),
+                local_verifier=lambda hotkey, message, signature: True,
+            )
+            middleware = Middleware(SignatureMiddleware, *middleware.args, **kwargs)
+        replay_app.user_middleware.append(middleware)
+    return replay_app
+
+
+async def _call_endpoint(endpoint: Any, app: FastAPI, record: CapturedRequest) -> int:
+    """Call a route handler directly, bypassing middlewares"""
+    body = record.body
+    sent = False
+
+    async def receive() -> dict[str, Any]:
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": f"/{record.synapse}",
+        "query_string": b"",
+        "headers": [
+            (k.encode("latin-1"), v.encode("latin-1"))
+            for k, v in record.headers.items()
+        ],
+        "app": app,
+    }
+    try:
+        response = await endpoint(Request(scope, receive))
+    except HTTPException as e:
+        return e.status_code
+    if isinstance(response, StreamingResponse):
+        async for _ in response.body_iterator:
+            pass
+    return response.status_code
+
+
+async def replay(
+    server: Server | FastAPI,
+    path: str,
+    speed: float = 1.0,
+    target: ReplayTarget = "server",
+    concurrency: int | None = None,
+    trust_signatures: bool = True,
+) -> ReplayReport:
+    """Replay the requests of a capture file against a server.
+
+    Args:
+        server (Server | FastAPI): server, or app, serving the captured synapses
+        path (str): capture file written with `Server(capture_path=...)`
+        speed (float): replay `speed` times faster than captured, 0 replays
+            as fast as `concurrency` allows
+        target (ReplayTarget): "server" sends requests through the whole app,
+            middlewares included, "handler" calls the route handlers directly
+        concurrency (int | None): max number of requests in flight
+        trust_signatures (bool): captures don't contain signatures, so accept
+            any signature while replaying through the whole app. Replayed
+            requests go through a copy of the app's middlewares, the
+            server's own verifier keeps verifying live traffic.
+    """
+    assert speed >= 0, "speed must not be negative"
+    app = server.app if isinstance(server, Server) else server
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+    endpoints = _route_endpoints(app)
+    client = (
+        httpx.AsyncClient(
+            transport=httpx.ASGITransport(
+                app=_trusting_app(app) if trust_signatures else app
+            ),
+            base_url="http://replay",
+        )
+        if target == "server"
+        else None
+    )
+
+    latencies: list[float] = []
+    captured: list[float] = []
+    report = ReplayReport()
+
+    async def _send(record: CapturedRequest) -> None:
+        start = time.perf_counter()
+        try:
+            if client is not None:
+                headers = {
+                    k: v for k, v in record.headers.items() if k.lower() != "host"
+                }
+                headers[SIGNATURE_HEADER] = "replay"
+                response = await client.post(
+                    f"/{record.synapse}", content=record.body, headers=headers
+                )
+                status_code = response.status_code
+            else:
+                endpoint = endpoints.get(record.synapse)
+                if endpoint is None:
+                    raise ValueError(f"Synapse {record.synapse} is not served")
+                status_code = await _call_endpoint(endpoint, app, record)
+        except Exception as e:
+            logger.error(f"Failed to replay {record.synapse}: {e}")
+            status_code = 0
+        latencies.append((time.perf_counter() - start) * 1000)
+        status_code = int(status_code)
+        report.status_codes[status_code] = report.status_codes.get(status_code, 0) + 1
+        if not 0 < status_code < 400:
+            report.errors += 1
+
+    async def _limited(record: CapturedRequest) -> None:
+        if semaphore is None:
+            return await _send(record)
+        async with semaphore:
+            return await _send(record)
+
+    tasks: list[asyncio.Task[None]] = []
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    first_timestamp: float | None = None
+    try:
+        for record in read_capture(path):
+            if first_timestamp is None:
+                first_timestamp = record.timestamp
+            if speed:
+                delay = (record.timestamp - first_timestamp) / speed - (
+                    loop.time() - started
+                )
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if record.handler_ms is not None:
+                captured.append(record.handler_ms)
+            tasks.append(asyncio.create_task(_limited(record)))
+        await asyncio.gather(*tasks)
+    finally:
+        if client is not None:
+            await client.aclose()
+
+    latencies.sort()
+    captured.sort()
+    report.requests = len(latencies)
+    report.duration_sec = loop.time() - started
+    report.throughput_rps = (
+        report.requests / report.duration_sec if report.duration_sec else 0.0
+    )
+    report.latency_p50_ms = _percentile(latencies, 0.5)
+    report.latency_p90_ms = _percentile(latencies, 0.9)
+    report.latency_p99_ms = _percentile(latencies, 0.99)
+    report.latency_max_ms = latencies[-1] if latencies else 0.0
+    if captured:
+        report.captured_handler_p50_ms = _percentile(captured, 0.5)
+    return report
+
+
+def _load_server(spec: str) -> Server | FastAPI:
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"Expected <module>:<attribute>, got {spec!r}")
+    return getattr(import_module(module_name), attr)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("path", help="capture file")
+    parser.add_argument(
+        "--server",
+        required=True,
+        help="<module>:<attribute> of the Server, or FastAPI app, to replay into",
+    )
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--target", choices=["server", "handler"], default="server")
+    parser.add_argument("--concurrency", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(
+        replay(
+            _load_server(args.server),
+            args.path,
+            speed=args.speed,
+            target=args.target,
+            concurrency=args.concurrency,
+        )
+    )
+    print(report.model_dump_json(indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
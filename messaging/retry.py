@@ -0,0 +1,93 @@
+import asyncio
+from functools import lru_cache
+from http import HTTPStatus
+
+import aiohttp
+from pydantic import BaseModel, ValidationError
+from tenacity import Future, RetryError
+
+from .exceptions import SynapseStatusError
+
+
+class RetryBudgetMetrics(BaseModel):
+    """Counters for a client-wide retry budget"""
+
+    first_attempts: int = 0
+    retries: int = 0
+    retries_denied: int = 0
+    non_retryable_failures: int = 0
+    tokens: float = 0.0
+
+    @property
+    def retry_ratio(self) -> float:
+        """Retries sent per first attempt"""
+        return self.retries / self.first_attempts if self.first_attempts else 0.0
+
+
+class RetryBudget:
+    """Token bucket that bounds retries to a fraction of first attempts, shared
+    by every request of a client (or of several clients) so that degraded
+    miners don't turn `batch_send` into a retry storm.
+
+    Every first attempt deposits `ratio` tokens, up to `max_tokens`, and every
+    retry withdraws one token, retries are denied while the bucket is empty.
+    The bucket starts with `reserve` tokens so that a client which has only
+    sent a few requests may still retry.
+    """
+
+    def __init__(
+        self, ratio: float = 0.1, reserve: float = 10.0, max_tokens: float = 100.0
+    ) -> None:
+        assert ratio >= 0.0, "ratio must not be negative"
+        assert max_tokens >= reserve >= 0.0, "reserve must be between 0 and max_tokens"
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.metrics = RetryBudgetMetrics(tokens=reserve)
+
+    def record_attempt(self) -> None:
+        metrics = self.metrics
+        metrics.first_attempts += 1
+        metrics.tokens = min(self.max_tokens, metrics.tokens + self.ratio)
+
+    def try_retry(self) -> bool:
+        """Withdraw a token for a retry, returns False if the budget is spent"""
+        metrics = self.metrics
+        if metrics.tokens < 1.0:
+            metrics.retries_denied += 1
+            return False
+        metrics.tokens -= 1.0
+        metrics.retries += 1
+        return True
+
+    def record_non_retryable(self) -> None:
+        self.metrics.non_retryable_failures += 1
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Only connection errors, timeouts and 5xx responses are worth retrying,
+    4xx responses and invalid payloads would fail the same way again"""
+    if isinstance(exc, (aiohttp.ClientResponseError, SynapseStatusError)):
+        return exc.status >= HTTPStatus.INTERNAL_SERVER_ERROR
+    if isinstance(exc, ValidationError):
+        return False
+    return isinstance(
+        exc, (aiohttp.ClientConnectionError, asyncio.TimeoutError, ConnectionError)
+    )
+
+
+@lru_cache(maxsize=64)
+def backoff_delays(
+    max_attempts: int, multiplier: float, max_wait_sec: float
+) -> tuple[float, ...]:
+    """Exponential backoff before each retry, the same schedule as tenacity's
+    `wait_exponential(multiplier, max)`, computed once per configuration"""
+    return tuple(
+        min(max_wait_sec, multiplier * 2**attempt)
+        for attempt in range(max(max_attempts - 1, 0))
+    )
+
+
+def retry_error(attempt_number: int, exc: BaseException) -> RetryError:
+    """Wrap the last failure the same way tenacity does once retries stop, so
+    that callers checking for `RetryError` keep working"""
+    return RetryError(Future.construct(attempt_number, exc, True))
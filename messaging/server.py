@@ -1,26 +1,99 @@
+import asyncio
+import inspect
 import logging
+import sys
+import time
 import traceback
 from http import HTTPStatus
-from typing import Any, List, Type
+from typing import Any, AsyncIterator, List, Type
 
 import httpx
 import orjson
 import uvicorn
-from fastapi import APIRouter, FastAPI, HTTPException, Request
-from fastapi.responses import ORJSONResponse
+from fastapi import (
+    APIRouter,
+    FastAPI,
+    HTTPException,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from kami import KamiClient
 from loguru import logger
 from pydantic import BaseModel
+from starlette.requests import HTTPConnection
 from typing import Callable
 
 
-from .exceptions import InvalidSignatureException
+from .batching import BatchMetrics, MicroBatcher
+from .capture import CaptureWriter
+from .exceptions import InvalidSignatureException, PayloadTooLargeError
+from .log import AccessLogSampler, BackgroundSink
 from .middleware import SignatureMiddleware, ZstdMiddleware
-from .types import InterceptHandler, PydanticModel, ServerHandlerFunc
-from .utils import create_response
+from .registry import get_codec
+from .types import (
+    BATCH_ROUTE,
+    FRAMED_STREAM_MEDIA_TYPE,
+    BatchHandlerFunc,
+    HOTKEY_HEADER,
+    MESSAGE_HEADER,
+    MULTIPLEX_ROUTE,
+    SIGNATURE_HEADER,
+    InterceptHandler,
+    PydanticModel,
+    ServerHandlerFunc,
+    ServerStreamHandlerFunc,
+)
+from .verification import LocalVerifierFunc, VerificationDispatcher
+from .utils import (
+    DEFAULT_MAX_COMPRESSED_SIZE,
+    DEFAULT_MAX_DECOMPRESSED_SIZE,
+    MESSAGE_ID,
+    check_size,
+    compress_json,
+    create_response,
+    decompress_json,
+    encode_frame,
+)
 
 router = APIRouter()
 
+# NOTE: a single background sink is shared by every `Server` of the process,
+# otherwise each line would be logged once per server. It is removed once the
+# last server using it is closed.
+_background_sink_id: int | None = None
+_background_sink_users = 0
+
+
+def _acquire_background_sink(level: str) -> int:
+    global _background_sink_id, _background_sink_users
+    if _background_sink_id is None:
+        # NOTE: only replace loguru's default handler, sinks added by the
+        # application are left untouched
+        try:
+            logger.remove(0)
+        except ValueError:
+            pass
+        _background_sink_id = logger.add(
+            BackgroundSink(sys.stderr),
+            level=level,
+            colorize=sys.stderr.isatty(),
+        )
+    _background_sink_users += 1
+    return _background_sink_id
+
+
+def _release_background_sink() -> None:
+    global _background_sink_id, _background_sink_users
+    _background_sink_users -= 1
+    if _background_sink_users == 0 and _background_sink_id is not None:
+        # NOTE: flushes the backlog of the background sink
+        logger.remove(_background_sink_id)
+        _background_sink_id = None
+
 
 class Server:
     def __init__(
@@ -28,7 +101,52 @@ class Server:
         app: FastAPI | None = None,
         kami: KamiClient | None = None,
         log_level: str = None,  # type: ignore
+        verify_batch_size: int = 64,
+        verify_window_ms: float = 0.0,
+        local_verifier: LocalVerifierFunc | None = None,
+        background_logging: bool = False,
+        access_log_sample_rate: float = 1.0,
+        capture_path: str | None = None,
+        max_compressed_size: int | None = DEFAULT_MAX_COMPRESSED_SIZE,
+        max_decompressed_size: int | None = DEFAULT_MAX_DECOMPRESSED_SIZE,
+        multiplex_max_in_flight: int = 256,
+        batch_max_in_flight: int = 256,
     ) -> None:
+        """
+        Args:
+            app (FastAPI | None): optional app to register routes on
+            kami (KamiClient | None): client used to verify signatures
+            log_level (str): log level of stdlib logging, defaults to INFO
+            verify_batch_size (int): max number of signature verifications
+                coalesced into a single batch
+            verify_window_ms (float): how long to wait to gather verifications
+                into a batch, by default only those arriving in the same event
+                loop iteration are batched
+            local_verifier (LocalVerifierFunc | None): optional local
+                `(hotkey, message, signature) -> bool` crypto verifier used
+                instead of round-trips to Kami
+            background_logging (bool): replace loguru's default stderr sink with
+                one that writes from a background thread, at `log_level`, so
+                that logging never blocks the event loop. The sink is shared
+                by every server of the process, at the level of the first.
+            access_log_sample_rate (float): fraction of successful uvicorn
+                access logs to keep, error responses are always logged
+            capture_path (str | None): record every synapse request, with its
+                decoded body, headers minus the signature, size and handler
+                timing, to this append-only file, which can be replayed with
+                `python -m messaging.replay`
+            max_compressed_size (int | None): max size of a request body as
+                received, larger requests are rejected with 413 before being
+                fully read, None, the default, disables the limit
+            max_decompressed_size (int | None): max size of a request body
+                once decompressed, checked while decompressing. Limits passed
+                to `register_synapse` take precedence for that synapse.
+            multiplex_max_in_flight (int): max number of requests handled at
+                once per multiplexed connection, further messages are only read
+                once one of them completes
+            batch_max_in_flight (int): max number of payloads of a single
+                `/_batch` request handled at once
+        """
         if not log_level:
             log_level = "INFO"
         assert log_level in [
@@ -41,20 +159,56 @@ class Server:
             "CRITICAL",
         ]
         self._log_level = log_level
+        self._background_logging = background_logging
+        self._access_log_sample_rate = access_log_sample_rate
+        self._log_sink_id: int | None = None
 
         self._configure_loguru_logging()
 
         self.app = app or FastAPI()
         self.kami = kami or KamiClient()
+        self.verifier = VerificationDispatcher(
+            self.kami,
+            max_batch_size=verify_batch_size,
+            window_ms=verify_window_ms,
+            local_verifier=local_verifier,
+        )
         self.app.include_router(router)
-        self.app.add_middleware(ZstdMiddleware)
-        self.app.add_middleware(SignatureMiddleware, kami=self.kami)
+        self._max_compressed_size = max_compressed_size
+        self._max_decompressed_size = max_decompressed_size
+        assert multiplex_max_in_flight > 0, "multiplex_max_in_flight must be positive"
+        self._multiplex_max_in_flight = multiplex_max_in_flight
+        assert batch_max_in_flight > 0, "batch_max_in_flight must be positive"
+        self._batch_max_in_flight = batch_max_in_flight
+        self.app.add_middleware(
+            ZstdMiddleware,
+            max_compressed_size=max_compressed_size,
+            max_decompressed_size=max_decompressed_size,
+        )
+        self.app.add_middleware(
+            SignatureMiddleware, kami=self.kami, verifier=self.verifier
+        )
         # NOTE: here we register some exception handlers that make it easier to
         # write miner's code
         self._add_http_exception_handler()
         self._add_invalid_signature_exception_handler()
         self.add_global_exception_handler()
         self.config = None
+        self.capture = CaptureWriter(capture_path) if capture_path else None
+        # synapse name -> (synapse, handler), used to dispatch requests that
+        # arrive over the multiplexed channel
+        self._synapses: dict[
+            str,
+            tuple[Type[BaseModel], ServerHandlerFunc | ServerStreamHandlerFunc],
+        ] = {}
+        self._batchers: dict[str, MicroBatcher] = {}
+        self.app.add_api_websocket_route(MULTIPLEX_ROUTE, self._multiplex_endpoint)
+        self.app.add_api_route(
+            BATCH_ROUTE,
+            self._batch_endpoint,
+            methods=["POST"],
+            operation_id="handle_batch",
+        )
 
     def _configure_loguru_logging(self) -> None:
         """Configure FastAPI/uvicorn to use loguru logging"""
@@ -83,11 +237,28 @@ class Server:
             logging_logger.handlers = []
             logging_logger.propagate = True
 
+        access_logger = logging.getLogger("uvicorn.access")
+        for log_filter in access_logger.filters[:]:
+            if isinstance(log_filter, AccessLogSampler):
+                access_logger.removeFilter(log_filter)
+        if self._access_log_sample_rate < 1.0:
+            access_logger.addFilter(AccessLogSampler(self._access_log_sample_rate))
+
+        if self._background_logging and self._log_sink_id is None:
+            self._log_sink_id = _acquire_background_sink(self._log_level)
+
     async def close(self):
         if hasattr(self, "server") and self.server:
             self.server.should_exit = True
             await self.server.shutdown()
+        for batcher in self._batchers.values():
+            await batcher.close()
         await self.kami.close()
+        if self.capture is not None:
+            self.capture.close()
+        if self._log_sink_id is not None:
+            _release_background_sink()
+            self._log_sink_id = None
 
     def add_global_exception_handler(self) -> None:
         """Register exception handlers to standardize error responses"""
@@ -138,11 +309,264 @@ class Server:
             )
 
     def serve_synapse(
-        self, synapse: Type[PydanticModel], handler: ServerHandlerFunc[PydanticModel]
+        self,
+        synapse: Type[PydanticModel],
+        handler: ServerHandlerFunc[PydanticModel]
+        | ServerStreamHandlerFunc[PydanticModel],
     ) -> None:
+        """Serve a synapse at /<synapse name>. If the handler is an async
+        generator, each yielded item is streamed back as a partial result that
+        can be consumed with `Client.stream`.
+
+        Requests arriving over the multiplexed channel are passed to the
+        handler with the connection's `WebSocket` instead of a `Request`: its
+        headers, including the hotkey, and client are available, but not the
+        body, which is already validated into the payload. Likewise, requests
+        arriving through the `/_batch` route are passed with the `Request` of
+        the whole batch, whose `body()` is the list of every batched payload."""
         # NOTE: we always want to have signature middleware, as miners should
         # only be reachable by validators
-        self.app = _register_route_handler(self.app, handler, model=synapse)
+        self._synapses[synapse.__name__] = (synapse, handler)
+        self.app = _register_route_handler(
+            self.app, handler, model=synapse, capture=self.capture
+        )
+
+    def serve_batched_synapse(
+        self,
+        synapse: Type[PydanticModel],
+        handler: BatchHandlerFunc[PydanticModel],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+        max_pending: int = 1024,
+        max_concurrent_batches: int = 1,
+    ) -> None:
+        """Serve a synapse whose handler processes many payloads at once, e.g.
+        for batched model inference. Validated payloads are collected for up to
+        `max_batch_size` items or `max_wait_ms`, then passed to
+        `async def handler(requests, payloads) -> list[result]` in one call,
+        and each caller receives its own result.
+
+        Requests are rejected with 503 once `max_pending` payloads are waiting
+        to be batched. Per-batch metrics are available from `batch_metrics`.
+        """
+        batcher = MicroBatcher(
+            handler,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            max_pending=max_pending,
+            max_concurrent_batches=max_concurrent_batches,
+        )
+        self._batchers[synapse.__name__] = batcher
+
+        async def batched_handler(request: Request, payload: PydanticModel) -> Any:
+            return await batcher.submit(request, payload)
+
+        batched_handler.__name__ = handler.__name__
+        batched_handler.__doc__ = handler.__doc__
+        self.serve_synapse(synapse, batched_handler)
+
+    @property
+    def batch_metrics(self) -> dict[str, BatchMetrics]:
+        """Metrics of each synapse served with `serve_batched_synapse`"""
+        return {name: batcher.metrics for name, batcher in self._batchers.items()}
+
+    async def _multiplex_endpoint(self, websocket: WebSocket) -> None:
+        """Serve many synapse requests over a single websocket connection.
+
+        Each binary message is a `MESSAGE_ID` request ID followed by a zstd
+        compressed {synapse, body, max_size} object, and is answered with the
+        same ID followed by a {body, error, metadata, status} object once its
+        handler completes, so responses may arrive out of order. Responses
+        larger than the [compressed, decompressed] `max_size` the client
+        accepts are replaced by a 413 with a `too_large` field. At most
+        `multiplex_max_in_flight` requests are handled at once, beyond that
+        messages are left unread, which pushes back on the client.
+        """
+        # NOTE: SignatureMiddleware only sees http requests, so verify the
+        # handshake here, once per connection
+        signature = websocket.headers.get(SIGNATURE_HEADER, "")
+        hotkey = websocket.headers.get(HOTKEY_HEADER, "")
+        message = websocket.headers.get(MESSAGE_HEADER, "")
+        try:
+            is_valid = bool(
+                hotkey and signature and message
+            ) and await self.verifier.verify(
+                hotkey=hotkey, message=message, signature=signature
+            )
+        except Exception as e:
+            logger.error(f"Failed to verify multiplexed channel signature: {e}")
+            is_valid = False
+        if not is_valid:
+            await websocket.close(code=1008, reason="Invalid signature")
+            return
+
+        await websocket.accept()
+        send_lock = asyncio.Lock()
+        tasks: set[asyncio.Task[None]] = set()
+        in_flight = asyncio.Semaphore(self._multiplex_max_in_flight)
+
+        async def _respond(data: bytes) -> None:
+            try:
+                response = await self._handle_multiplexed(websocket, data)
+                if response is not None:
+                    async with send_lock:
+                        await websocket.send_bytes(response)
+            finally:
+                in_flight.release()
+
+        try:
+            while True:
+                await in_flight.acquire()
+                data = await websocket.receive_bytes()
+                task = asyncio.create_task(_respond(data))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except WebSocketDisconnect:
+            logger.debug(f"Multiplexed channel from {hotkey=} disconnected")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _dispatch(
+        self, request: HTTPConnection, synapse_name: str, data: Any
+    ) -> tuple[Any, str | None, int]:
+        """Validate the payload of a served synapse by name and run its handler,
+        returning the body, error and status code to respond with"""
+        if synapse_name not in self._synapses:
+            return {}, f"Synapse {synapse_name} is not served", HTTPStatus.NOT_FOUND
+
+        model, handler = self._synapses[synapse_name]
+        if inspect.isasyncgenfunction(handler):
+            return (
+                {},
+                f"Streaming handler for {synapse_name} can only be served at its own route",
+                HTTPStatus.BAD_REQUEST,
+            )
+
+        received_at = time.time()
+        codec = get_codec(model)
+        raw = (
+            orjson.dumps(data)
+            if codec.max_decompressed_size is not None or self.capture is not None
+            else None
+        )
+        try:
+            # NOTE: the whole batch or message was only checked against the
+            # server's limits, apply those registered for this synapse
+            check_size(
+                len(raw) if raw is not None else None,
+                codec.max_decompressed_size,
+                "decompressed",
+            )
+        except PayloadTooLargeError as e:
+            logger.warning(f"Rejected {synapse_name} payload: {e}")
+            return {}, str(e), HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+        try:
+            payload = codec.validate(data or {})
+        except Exception as e:
+            logger.error(f"Validation error: {str(e)}")
+            return data, f"Validation error: {str(e)}", HTTPStatus.BAD_REQUEST
+
+        start = time.perf_counter()
+        body, error, status_code = await _call_handler(
+            handler,  # type: ignore[arg-type]
+            request,
+            payload,
+        )
+        if self.capture is not None and raw is not None:
+            self.capture.record(
+                received_at,
+                synapse_name,
+                request.headers,
+                raw,
+                (time.perf_counter() - start) * 1000,
+                status_code,
+            )
+        return body, error, status_code
+
+    async def _handle_multiplexed(
+        self, websocket: WebSocket, raw: bytes
+    ) -> bytes | None:
+        """Decode a single multiplexed request, run it through its handler and
+        encode its response, None if the message has no request ID to answer"""
+        if len(raw) < MESSAGE_ID.size:
+            logger.error("Received multiplexed message without a request ID")
+            return None
+        (request_id,) = MESSAGE_ID.unpack_from(raw)
+        max_compressed_size = max_decompressed_size = None
+        try:
+            message: dict[str, Any] = decompress_json(
+                memoryview(raw)[MESSAGE_ID.size :], self._max_decompressed_size
+            )
+        except PayloadTooLargeError as e:
+            logger.warning(f"Rejected multiplexed message: {e}")
+            envelope = _synapse_envelope(
+                {}, str(e), HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+            )
+        except Exception as e:
+            logger.error(f"Failed to decode multiplexed message: {str(e)}")
+            envelope = _synapse_envelope({}, f"Invalid message: {str(e)}", 400)
+        else:
+            body, error, status_code = await self._dispatch(
+                websocket, message.get("synapse", ""), message.get("body")
+            )
+            envelope = _synapse_envelope(body, error, status_code)
+            max_compressed_size, max_decompressed_size = message.get("max_size") or (
+                None,
+                None,
+            )
+
+        content = orjson.dumps(envelope)
+        # NOTE: the content is already serialized, so it is compressed as is
+        compressed = compress_json(orjson.Fragment(content))
+        try:
+            # NOTE: the client would refuse a larger response, tell it why
+            # instead of sending it
+            check_size(len(content), max_decompressed_size, "decompressed")
+            check_size(len(compressed), max_compressed_size, "compressed")
+        except PayloadTooLargeError as e:
+            logger.warning(f"Response to multiplexed request is too large: {e}")
+            envelope = _synapse_envelope(
+                {}, str(e), HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+            )
+            envelope["too_large"] = {"size": e.size, "limit": e.limit, "kind": e.kind}
+            compressed = compress_json(envelope)
+        return MESSAGE_ID.pack(request_id) + compressed
+
+    async def _batch_endpoint(self, request: Request) -> ORJSONResponse:
+        """Run many payloads, possibly of different synapses, through their
+        handlers concurrently, at most `batch_max_in_flight` at once. Expects a
+        list of {synapse, body} objects and responds with a list of
+        {body, error, metadata, status} objects in the same order."""
+        try:
+            # NOTE: already decompressed by ZstdMiddleware
+            items = orjson.loads(await request.body())
+        except orjson.JSONDecodeError as e:
+            logger.error(f"JSON Decode error: {str(e)}")
+            return create_response(
+                error=f"Invalid JSON, exception: {str(e)}", body={}, status_code=400
+            )
+        if not isinstance(items, list):
+            return create_response(
+                error="Expected a list of {synapse, body} objects",
+                body={},
+                status_code=400,
+            )
+
+        in_flight = asyncio.Semaphore(self._batch_max_in_flight)
+
+        async def _run(item: Any) -> dict[str, Any]:
+            if not isinstance(item, dict):
+                return _synapse_envelope({}, "Expected a {synapse, body} object", 400)
+            async with in_flight:
+                body, error, status_code = await self._dispatch(
+                    request, item.get("synapse", ""), item.get("body")
+                )
+            return _synapse_envelope(body, error, status_code)
+
+        results = await asyncio.gather(*[_run(item) for item in items])
+        logger.success(f"Handled batch of {len(results)} synapses")
+        return create_response(body={"results": results})
 
     async def initialise(self, port: int) -> bool:
         try:
@@ -158,6 +582,9 @@ class Server:
                 log_level=None,
                 reload=False,
             )
+            if self._max_compressed_size is not None:
+                # NOTE: multiplexed requests arrive as websocket messages
+                server_config.ws_max_size = self._max_compressed_size
             self.config = server_config
             logger.info(
                 f"Using server config host:{server_config.host}, port: {server_config.port}, log_level: {server_config.log_level}"
@@ -189,38 +616,114 @@ class Server:
             raise Exception("All IP detection services failed")
 
 
+def _synapse_envelope(
+    body: Any,
+    error: str | None,
+    status_code: int,
+) -> dict[str, Any]:
+    """Equivalent of `create_response` for a single synapse result that is sent
+    alongside others, over the multiplexed channel or the batch route"""
+    return {
+        "body": jsonable_encoder(body),
+        "error": error,
+        "metadata": {},
+        "status": int(status_code),
+    }
+
+
+def _normalize_result(result: Any, keep: type | None = None) -> Any:
+    """Convert a handler's result into something `create_response` can encode,
+    instances of exactly `keep`, not of its subclasses, are returned as-is to
+    be serialized by a codec"""
+    if isinstance(result, bytes):
+        return orjson.loads(result)
+    if keep is not None and type(result) is keep:
+        return result
+    if issubclass(type(result), BaseModel):
+        return result.model_dump()
+    return result
+
+
+async def _call_handler(
+    handler: ServerHandlerFunc[PydanticModel],
+    request: HTTPConnection,
+    payload: PydanticModel,
+    keep: type | None = None,
+) -> tuple[Any, str | None, int]:
+    """Run a handler on a validated payload, returning the body, error and
+    status code to respond with"""
+    try:
+        # TODO: figure out why result is None?
+        result = await handler(request, payload)  # type: ignore[arg-type]
+        logger.success(
+            f"Handler: {handler.__name__}, result type:{type(result)}, result:{result}"
+        )
+        return _normalize_result(result, keep), None, HTTPStatus.OK
+    except HTTPException as e:
+        logger.error(f"HTTPException: {str(e)}")
+        return {}, str(e.detail), e.status_code
+    except Exception as e:
+        traceback.print_exc()
+        logger.error(f"Error processing request due to: {str(e)}")
+        # TODO: add more context here
+        return {}, f"Internal server error: {str(e)}", HTTPStatus.OK
+
+
+async def _iter_partial_results(
+    handler_name: str, results: AsyncIterator[Any]
+) -> AsyncIterator[bytes]:
+    """Encode each item yielded by a streaming handler as its own frame,
+    errors raised mid-stream are sent as a final frame with `error` set"""
+    try:
+        async for result in results:
+            yield encode_frame(body=_normalize_result(result))
+        logger.success(f"Handler: {handler_name}, finished streaming results")
+    except HTTPException as e:
+        logger.error(f"HTTPException while streaming: {str(e)}")
+        yield encode_frame(body={}, error=str(e.detail))
+    except Exception as e:
+        traceback.print_exc()
+        logger.error(f"Error streaming results due to: {str(e)}")
+        yield encode_frame(body={}, error=f"Internal server error: {str(e)}")
+
+
 def _register_route_handler(
     app: FastAPI,
-    handler: ServerHandlerFunc[PydanticModel],
+    handler: ServerHandlerFunc[PydanticModel] | ServerStreamHandlerFunc[PydanticModel],
     model: Type[PydanticModel],
     # NOTE: let's just default to post for now
     methods: List[str] = ["POST", "HEAD"],
+    capture: CaptureWriter | None = None,
 ) -> FastAPI:
     """Register a route with a Pydantic model to allow easily adding new endpoints"""
 
-    async def handler_wrapper(request: Request) -> ORJSONResponse:
+    codec = get_codec(model)
+    is_streaming = inspect.isasyncgenfunction(handler)
+
+    async def handler_wrapper(request: Request) -> Response:
         """Wrapper around the request that handles zstd decompression and payload validation"""
         try:
             if request.method == "HEAD":
                 return create_response(status_code=HTTPStatus.OK, body={})
+            received_at = time.time()
 
-            data: dict[str, Any] = {}
+            # NOTE: we should be able to just read the data directly since
+            # there's ZstdMiddleware enabled
+            raw_body = await request.body()
             try:
-                # NOTE: we should be able to just read the data directly since
-                # there's ZstdMiddleware enabled
-                data = orjson.loads(await request.body())
-            except orjson.JSONDecodeError as e:
-                logger.error(f"JSON Decode error: {str(e)}")
-                return create_response(
-                    error=f"Invalid JSON, exception: {str(e)}",
-                    body=data,
-                    status_code=400,
-                )
-
-            try:
-                logger.debug(f"Attempting to validate payload: {data=}")
-                payload = model.model_validate(data)
+                # parse and validate in a single pass
+                payload = codec.validate_json(raw_body)
             except Exception as e:
+                data: dict[str, Any] = {}
+                try:
+                    data = orjson.loads(raw_body)
+                except orjson.JSONDecodeError as decode_error:
+                    logger.error(f"JSON Decode error: {str(decode_error)}")
+                    return create_response(
+                        error=f"Invalid JSON, exception: {str(decode_error)}",
+                        body=data,
+                        status_code=400,
+                    )
                 logger.error(f"Validation error: {str(e)}")
                 return create_response(
                     error=f"Validation error: {str(e)}",
@@ -228,20 +731,40 @@ def _register_route_handler(
                     status_code=400,
                 )
 
-            # TODO: figure out why result is None?
-            result = await handler(request, payload)
+            if is_streaming:
+                if capture is not None:
+                    # NOTE: partial results are sent as the handler runs, so
+                    # there is no handler timing to record
+                    capture.record(
+                        received_at, codec.name, request.headers, raw_body, None, 200
+                    )
+                return StreamingResponse(
+                    _iter_partial_results(
+                        handler.__name__,
+                        handler(request, payload),  # type: ignore[arg-type]
+                    ),
+                    media_type=FRAMED_STREAM_MEDIA_TYPE,
+                )
 
-            logger.success(
-                f"Handler: {handler.__name__}, result type:{type(result)}, result:{result}"
+            start = time.perf_counter()
+            body, error, status_code = await _call_handler(
+                handler,  # type: ignore[arg-type]
+                request,
+                payload,
+                keep=model,
+            )
+            if capture is not None:
+                capture.record(
+                    received_at,
+                    codec.name,
+                    request.headers,
+                    raw_body,
+                    (time.perf_counter() - start) * 1000,
+                    status_code,
+                )
+            return create_response(
+                body=body, error=error, status_code=status_code, codec=codec
             )
-            if not isinstance(result, dict):
-                if isinstance(result, bytes):
-                    result = orjson.loads(result)
-                elif issubclass(type(result), BaseModel):
-                    result = result.model_dump()
-                return create_response(body=result)
-
-            return create_response(body=result)
         except HTTPException as e:
             logger.error(f"HTTPException: {str(e)}")
             raise e
@@ -255,10 +778,10 @@ def _register_route_handler(
     description = handler.__doc__ if handler.__doc__ else handler_wrapper.__doc__
     handler_wrapper.__name__ = handler.__name__
     app.add_api_route(
-        path="/" + model.__name__.lstrip("/").rstrip("/"),
+        path=codec.route,
         endpoint=handler_wrapper,
         methods=methods,
-        operation_id=f"handle_{model.__name__}",
+        operation_id=f"handle_{codec.name}",
         description=description,
     )
     return app
@@ -0,0 +1,221 @@
+import asyncio
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing.util import Finalize
+from typing import Any, AsyncIterator, Callable, Sequence, Type
+
+import orjson
+from loguru import logger
+from pydantic import BaseModel, ValidationError
+
+from .client import Client, _base_url
+from .exceptions import WorkerRequestError
+from .registry import get_codec
+from .types import PydanticModel, StdResponse
+
+# (body JSON, error, metadata JSON, (exception type name, message) or None)
+PackedResponse = tuple[bytes, str | None, bytes, tuple[str, str] | None]
+
+# NOTE: state of each worker process, set up once by `_init_worker`
+_worker_loop: asyncio.AbstractEventLoop | None = None
+_worker_client: Client | None = None
+
+
+def _init_worker(client_factory: Callable[[], Client]) -> None:
+    global _worker_loop, _worker_client
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+
+    # NOTE: aiohttp sessions should be created with a running loop
+    async def _create() -> Client:
+        return client_factory()
+
+    _worker_client = _worker_loop.run_until_complete(_create())
+    Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker() -> None:
+    if _worker_loop is None or _worker_client is None:
+        return
+    try:
+        _worker_loop.run_until_complete(_worker_client.close())
+    finally:
+        _worker_loop.close()
+
+
+def _pack(response: StdResponse[Any]) -> PackedResponse:
+    codec = get_codec(type(response.body))
+    exception = response.exception
+    return (
+        # NOTE: bodies of failed requests may be partially constructed
+        codec.adapter.dump_json(response.body, warnings=False),
+        response.error,
+        orjson.dumps(response.metadata, default=str),
+        (type(exception).__name__, str(exception)) if exception else None,
+    )
+
+
+def _unpack(model: BaseModel, packed: PackedResponse) -> StdResponse[Any]:
+    body_json, error, metadata_json, exception = packed
+    codec = get_codec(type(model))
+    try:
+        body = codec.validate_json(body_json)
+    except ValidationError:
+        body = model.model_construct(**orjson.loads(body_json))
+    return StdResponse(
+        body=body,
+        error=error,
+        metadata=orjson.loads(metadata_json),
+        exception=WorkerRequestError(*exception) if exception else None,
+        client_response=None,
+    )
+
+
+def _send_shard(
+    urls: list[str],
+    synapses: list[Type[BaseModel]],
+    bodies: list[bytes],
+    kwargs: dict[str, Any],
+) -> list[PackedResponse]:
+    """Runs in a worker process: sends a shard with the worker's own client"""
+    assert _worker_loop is not None and _worker_client is not None
+    models = [
+        get_codec(synapse).validate_json(body)
+        for synapse, body in zip(synapses, bodies)
+    ]
+    responses = _worker_loop.run_until_complete(
+        _worker_client.batch_send(urls, models, **kwargs)
+    )
+    return [_pack(response) for response in responses]
+
+
+class ShardedClient:
+    """Splits very large `batch_send` rounds across a pool of worker processes,
+    each with its own `Client`, event loop and session, so that decompression,
+    parsing and validation of responses use more than one core.
+
+    Shards are sent to the workers as compact JSON and responses come back the
+    same way, `client_response` is always None and exceptions raised in a
+    worker are returned as `WorkerRequestError`. Requests to the same host are
+    kept in the same shard where possible, so that `group_by_host` still
+    applies. Synapse classes must be importable by the worker processes.
+
+        sharded = ShardedClient(hotkey, processes=4)
+        responses = await sharded.batch_send(urls, models)
+        sharded.close()
+    """
+
+    def __init__(
+        self,
+        hotkey: str,
+        processes: int | None = None,
+        shard_size: int | None = None,
+        client_factory: Callable[[], Client] | None = None,
+        mp_context: str = "spawn",
+    ) -> None:
+        """
+        Args:
+            hotkey (str): hotkey used for signing requests
+            processes (int | None): number of worker processes, defaults to
+                the number of CPUs
+            shard_size (int | None): number of requests per shard, by default
+                each round is split in 4 shards per process so that results
+                can be returned as they complete
+            client_factory (Callable[[], Client] | None): picklable callable
+                creating the client of each worker, e.g. a module level
+                function or `functools.partial(Client, hotkey, multiplex=True)`,
+                defaults to `Client(hotkey)`
+            mp_context (str): multiprocessing start method of the workers
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context(mp_context),
+            initializer=_init_worker,
+            initargs=(client_factory or partial(Client, hotkey),),
+        )
+
+    def _shards(self, urls: Sequence[str]) -> list[list[int]]:
+        # NOTE: stable sort, so requests to a host stay in their original order
+        order = sorted(range(len(urls)), key=lambda idx: _base_url(urls[idx]))
+        shard_size = self.shard_size or max(
+            1, math.ceil(len(urls) / (self.processes * 4))
+        )
+        return [order[i : i + shard_size] for i in range(0, len(order), shard_size)]
+
+    def _submit(
+        self,
+        urls: Sequence[str],
+        models: Sequence[PydanticModel],
+        kwargs: dict[str, Any],
+    ) -> dict[asyncio.Future[list[PackedResponse]], list[int]]:
+        if "semaphore" in kwargs:
+            raise ValueError(
+                "semaphore can't be shared with worker processes, use shard_size instead"
+            )
+        loop = asyncio.get_running_loop()
+        futures: dict[asyncio.Future[list[PackedResponse]], list[int]] = {}
+        for indices in self._shards(urls):
+            future = loop.run_in_executor(
+                self._executor,
+                _send_shard,
+                [urls[i] for i in indices],
+                [type(models[i]) for i in indices],
+                [models[i].model_dump_json().encode() for i in indices],
+                kwargs,
+            )
+            futures[future] = indices
+        return futures
+
+    async def batch_send(
+        self,
+        urls: list[str],
+        models: list[PydanticModel],
+        **kwargs: Any,
+    ) -> Sequence[StdResponse[PydanticModel]]:
+        """Same as `Client.batch_send`, with the round split across the worker
+        processes. Responses are returned in the original order."""
+        responses: list[StdResponse[PydanticModel] | None] = [None] * len(urls)
+        async for idx, response in self.as_completed(urls, models, **kwargs):
+            responses[idx] = response
+        return responses  # type: ignore[return-value]
+
+    async def as_completed(
+        self,
+        urls: list[str],
+        models: list[PydanticModel],
+        **kwargs: Any,
+    ) -> AsyncIterator[tuple[int, StdResponse[PydanticModel]]]:
+        """Same as `batch_send`, but yields (index, response) pairs as soon as
+        the shard containing them completes"""
+        futures = self._submit(urls, models, kwargs)
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for future in done:
+                    indices = futures[future]
+                    try:
+                        packed = future.result()
+                    except Exception as e:
+                        logger.error(
+                            f"Worker failed to send shard of {len(indices)} requests: {e}"
+                        )
+                        packed = [
+                            (b"{}", None, b"{}", (type(e).__name__, str(e)))
+                        ] * len(indices)
+                    for idx, item in zip(indices, packed):
+                        yield idx, _unpack(models[idx], item)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def close(self) -> None:
+        """Close the clients of the workers and stop them"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -1,19 +1,54 @@
 import logging
+import threading
 import traceback
-from typing import Any, Awaitable, Callable, Generic, TypeAlias, TypeVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Generic,
+    TYPE_CHECKING,
+    TypeAlias,
+    TypeVar,
+)
 
 import aiohttp
-from fastapi import Request
 from loguru import logger
 from pydantic import BaseModel, ConfigDict, field_serializer
 
+if TYPE_CHECKING:
+    # NOTE: only needed for annotations, avoid loading FastAPI in client-only
+    # processes
+    from fastapi import Request
+
 PydanticModel = TypeVar("PydanticModel", bound=BaseModel)
 # define a pydantic model here so that we can apply these to child of BaseModel
-ServerHandlerFunc: TypeAlias = Callable[[Request, PydanticModel], Awaitable[Any]]
+ServerHandlerFunc: TypeAlias = Callable[["Request", PydanticModel], Awaitable[Any]]
+# async generator handlers, each yielded item is sent to the client as a partial result
+ServerStreamHandlerFunc: TypeAlias = Callable[
+    ["Request", PydanticModel], AsyncIterator[Any]
+]
+# handlers that are called once with a whole micro-batch of requests and payloads,
+# returning one result per payload in the same order
+BatchHandlerFunc: TypeAlias = Callable[
+    [list["Request"], list[PydanticModel]], Awaitable[list[Any]]
+]
 
 SIGNATURE_HEADER = "x-signature"
 HOTKEY_HEADER = "x-hotkey"
 MESSAGE_HEADER = "x-message"
+# NOTE: set by the client when it sends a chunked body and is able to
+# incrementally decompress a chunked response
+STREAM_HEADER = "x-stream"
+# NOTE: media type of responses made up of length-prefixed, individually zstd
+# compressed {body, error, metadata} envelopes
+FRAMED_STREAM_MEDIA_TYPE = "application/x-zstd-framed"
+# NOTE: websocket route over which many requests share a single connection,
+# each message is a zstd compressed JSON object matched by its "id"
+MULTIPLEX_ROUTE = "/_multiplex"
+# NOTE: route that accepts a list of {synapse, body} objects in one request and
+# runs them through their handlers concurrently
+BATCH_ROUTE = "/_batch"
 
 
 class StdResponse(BaseModel, Generic[PydanticModel]):
@@ -54,6 +89,28 @@ class StdResponse(BaseModel, Generic[PydanticModel]):
         }
 
 
+# NOTE: the stdlib record currently being emitted, read by the cached patcher
+_intercepted = threading.local()
+
+
+def _patch_from_stdlib_record(r: Any) -> None:
+    record: logging.LogRecord | None = getattr(_intercepted, "record", None)
+    if record is None:
+        return
+    r.update(
+        name=record.name,
+        function=record.funcName,
+        file=record.pathname,
+        line=record.lineno,
+        module=record.module,
+    )
+
+
+# NOTE: patching once and reusing the patched logger, rather than calling
+# `logger.patch` for every record, which creates a new logger each time
+_patched_logger = logger.patch(_patch_from_stdlib_record)
+
+
 class InterceptHandler(logging.Handler):
     def emit(self, record):
         try:
@@ -63,14 +120,9 @@ class InterceptHandler(logging.Handler):
 
         # Use the logging record's information instead of trying to calculate depth
         try:
-            logger.patch(
-                lambda r: r.update(
-                    name=record.name,
-                    function=record.funcName,
-                    file=record.pathname,
-                    line=record.lineno,
-                    module=record.module,
-                )
-            ).log(level, record.getMessage())
+            _intercepted.record = record
+            _patched_logger.log(level, record.getMessage())
         except:  # noqa: E722
             pass
+        finally:
+            _intercepted.record = None
@@ -1,26 +1,40 @@
 from typing import Any
 
 
-from loguru import logger
-from tenacity import (
-    RetryCallState,
-)
-
-import zstandard as zstd
-from fastapi import HTTPException, Request
+from fastapi import HTTPException, Request, Response
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import ORJSONResponse
+from loguru import logger
 from pydantic import BaseModel
 
+from .client_utils import (  # noqa: F401
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_MAX_COMPRESSED_SIZE,
+    DEFAULT_MAX_DECOMPRESSED_SIZE,
+    FRAME_PREFIX,
+    MESSAGE_ID,
+    BoundedDecompressor,
+    check_size,
+    compress_json,
+    decompress_json,
+    encode_body,
+    iter_encoded_body,
+    iter_frames,
+    read_decoded_response,
+    read_response,
+)
+from .exceptions import PayloadTooLargeError
+from .registry import SynapseCodec
 from .types import HOTKEY_HEADER, MESSAGE_HEADER, SIGNATURE_HEADER
 
 
 def create_response(
-    body: dict[str, Any],
+    body: dict[str, Any] | BaseModel,
     status_code: int = 200,
     error: str | None = None,
     metadata: dict[str, Any] = {},
-):
+    codec: SynapseCodec[Any] | None = None,
+) -> Response:
     """
     Helper function to create standardized RESTful API responses
 
@@ -29,7 +43,18 @@ def create_response(
         status_code: HTTP status code (default: 200)
         error: Optional error message for error responses
         metadata: Optional metadata like pagination info, request ID, etc.
+        codec: Optional codec of the synapse, when the body is an instance of
+            exactly its model the envelope is serialized directly by its precompiled
+            serializer instead of going through `jsonable_encoder`
     """
+    # NOTE: subclasses have fields the codec's serializer doesn't know about
+    if codec is not None and type(body) is codec.model:
+        return Response(
+            content=codec.dump_envelope(body, error, metadata),
+            status_code=status_code,
+            media_type="application/json",
+        )
+
     content = {"body": jsonable_encoder(body), "error": error, "metadata": {}}  # pyright: ignore
 
     if metadata:
@@ -38,38 +63,72 @@ def create_response(
     return ORJSONResponse(content=content, status_code=status_code)
 
 
-def encode_body(model: BaseModel, headers: dict[str, Any]) -> bytes:
-    content_encoding = headers.get("content-encoding")
-    if content_encoding:
-        if content_encoding.lower() == "zstd":
-            json_data = model.model_dump_json().encode()
-            compressor = zstd.ZstdCompressor(level=3)
-            compressed = compressor.compress(json_data)
-            return compressed
-        else:
-            raise NotImplementedError(
-                f"Content encoding of type {content_encoding} is not supported at the moment"
-            )
-
-    return model.model_dump_json().encode()
-
-
-async def decode_body(request: Request) -> bytes:
-    """Handle zstd decoding to make transmission over network smaller"""
-    body = await request.body()
-    if (
+def encode_frame(
+    body: dict[str, Any],
+    error: str | None = None,
+    metadata: dict[str, Any] = {},
+) -> bytes:
+    """Encode a single {body, error, metadata} envelope as a length-prefixed,
+    zstd compressed frame, the streaming counterpart of `create_response`"""
+    content = {
+        "body": jsonable_encoder(body),
+        "error": error,
+        "metadata": jsonable_encoder(metadata) if metadata else {},
+    }
+    compressed = compress_json(content)
+    return FRAME_PREFIX.pack(len(compressed)) + compressed
+
+
+async def decode_body(
+    request: Request,
+    max_compressed_size: int | None = None,
+    max_decompressed_size: int | None = None,
+) -> bytes | bytearray:
+    """Handle zstd decoding to make transmission over network smaller.
+
+    The request body is decompressed incrementally as it arrives, so both
+    chunked (streamed) and regular bodies are supported without first
+    buffering the entire compressed payload. Raises `PayloadTooLargeError` as
+    soon as the body exceeds either limit.
+    """
+    content_length = request.headers.get("content-length", "")
+    size = int(content_length) if content_length.isdigit() else None
+    check_size(size, max_compressed_size, "compressed")
+    received = 0
+    if not (
         "content-encoding" in request.headers
         and "zstd" in request.headers["content-encoding"]
     ):
-        try:
-            decompressor = zstd.ZstdDecompressor()
-            body = decompressor.decompress(body)
-        except Exception as e:
-            raise HTTPException(
-                status_code=400, detail=f"Failed to decompress zstd data: {str(e)}"
-            )
+        if size is not None or (
+            max_compressed_size is None and max_decompressed_size is None
+        ):
+            check_size(size, max_decompressed_size, "decompressed")
+            return await request.body()
+
+        # NOTE: chunked body of unknown size, count it as it arrives
+        body = bytearray()
+        async for chunk in request.stream():
+            received += len(chunk)
+            check_size(received, max_compressed_size, "compressed")
+            check_size(received, max_decompressed_size, "decompressed")
+            body += chunk
+        return body
 
-    return body
+    try:
+        decompressor = BoundedDecompressor(max_decompressed_size)
+        async for chunk in request.stream():
+            if chunk:
+                received += len(chunk)
+                check_size(received, max_compressed_size, "compressed")
+                decompressor.decompress(chunk)
+    except PayloadTooLargeError:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=400, detail=f"Failed to decompress zstd data: {str(e)}"
+        )
+
+    return decompressor.result()
 
 
 def extract_headers(request: Request) -> tuple[str, str, str]:
@@ -87,12 +146,3 @@ def extract_headers(request: Request) -> tuple[str, str, str]:
     except Exception as e:
         logger.warning(f"Failed to extract_headers: {e}")
         return "", "", ""
-
-
-def retry_log(retry_state: RetryCallState):
-    """Custom retry logger that works well with loguru"""
-    func_name = getattr(retry_state.fn, "__name__", "<unknown_function>")
-    logger.debug(
-        f"Retrying {func_name} attempt {retry_state.attempt_number} "
-        f"after {retry_state.seconds_since_start:.1f}s due to: {retry_state.outcome.exception() if retry_state.outcome else ''}"
-    )
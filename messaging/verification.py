@@ -0,0 +1,137 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Protocol
+
+from loguru import logger
+
+# (hotkey, message, signature)
+VerifyKey = tuple[str, str, str]
+LocalVerifierFunc = Callable[[str, str, str], bool]
+
+
+class Verifier(Protocol):
+    async def verify(self, hotkey: str, message: str, signature: str) -> bool: ...
+
+
+class VerificationDispatcher:
+    """Coalesces signature verifications that arrive within `window_ms` of each
+    other, up to `max_batch_size`, into a single batch.
+
+    Each batch is verified by, in order of preference:
+    1. `local_verifier(hotkey, message, signature) -> bool`, if configured, run
+       in a thread so that crypto doesn't block the event loop
+    2. `verifier.verify_batch(items) -> list[bool]`, if the verifier exposes it
+    3. concurrent `verifier.verify(...)` calls otherwise
+
+    Identical (hotkey, message, signature) triples that are in flight at the
+    same time share a single verification.
+    """
+
+    def __init__(
+        self,
+        verifier: Verifier,
+        max_batch_size: int = 64,
+        window_ms: float = 0.0,
+        local_verifier: LocalVerifierFunc | None = None,
+    ) -> None:
+        assert max_batch_size > 0, "max_batch_size must be positive"
+        self.verifier = verifier
+        self.max_batch_size = max_batch_size
+        self.window_sec = window_ms / 1000
+        self.local_verifier = local_verifier
+        self._inflight: dict[VerifyKey, asyncio.Future[bool]] = {}
+        self._pending: list[VerifyKey] = []
+        self._flush_handle: asyncio.Handle | None = None
+        self._batches: set[asyncio.Task[None]] = set()
+
+    async def verify(self, hotkey: str, message: str, signature: str) -> bool:
+        key = (hotkey, message, signature)
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._inflight[key] = loop.create_future()
+            self._pending.append(key)
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                # NOTE: with no window, batch whatever arrives in the same
+                # iteration of the event loop
+                self._flush_handle = (
+                    loop.call_later(self.window_sec, self._flush)
+                    if self.window_sec
+                    else loop.call_soon(self._flush)
+                )
+        # NOTE: shield so that a cancelled request doesn't cancel the shared
+        # verification for other requests waiting on it
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        while self._pending:
+            batch = self._pending[: self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size :]
+            task = asyncio.create_task(self._verify_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _verify_batch(self, keys: list[VerifyKey]) -> None:
+        try:
+            results = await self._verify_many(keys)
+            for key, result in zip(keys, results):
+                future = self._inflight.get(key)
+                if future is None or future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(bool(result))
+        except Exception as e:
+            logger.error(f"Failed to verify batch of {len(keys)} signatures: {e}")
+            for key in keys:
+                future = self._inflight.get(key)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+        finally:
+            for key in keys:
+                self._inflight.pop(key, None)
+
+    async def _verify_many(self, keys: list[VerifyKey]) -> list[Any]:
+        if self.local_verifier is not None:
+            local_verifier = self.local_verifier
+            return await asyncio.to_thread(
+                lambda: [_safe_call(local_verifier, *key) for key in keys]
+            )
+
+        verify_batch: Callable[..., Awaitable[list[bool]]] | None = getattr(
+            self.verifier, "verify_batch", None
+        )
+        if verify_batch is not None:
+            results = await verify_batch(
+                [
+                    {"hotkey": hotkey, "message": message, "signature": signature}
+                    for hotkey, message, signature in keys
+                ]
+            )
+            if len(results) != len(keys):
+                raise ValueError(
+                    f"Expected {len(keys)} verification results, got {len(results)}"
+                )
+            return results
+
+        return await asyncio.gather(
+            *[
+                self.verifier.verify(
+                    hotkey=hotkey, message=message, signature=signature
+                )
+                for hotkey, message, signature in keys
+            ],
+            return_exceptions=True,
+        )
+
+
+def _safe_call(func: LocalVerifierFunc, *args: str) -> bool | BaseException:
+    try:
+        return func(*args)
+    except Exception as e:
+        return e